@@ -1,27 +1,30 @@
 import os
-import json
+import signal
 import asyncio
 import logging
-from typing import List
+from typing import List, Iterable
 
 import discord
 from discord import app_commands
-from discord.ext import tasks
 
-from sr.discord_bot.rss import check_posts
+from sr.discord_bot.rss import Feed, FeedReader
+from sr.discord_bot.state import StateStore
 from sr.discord_bot.teams import TeamsData
 from sr.discord_bot.constants import (
+    FEEDS,
+    ROLE_PREFIX,
     SPECIAL_ROLE,
     VERIFIED_ROLE,
     CHANNEL_PREFIX,
     VOLUNTEER_ROLE,
     TEAM_LEADER_ROLE,
-    FEED_CHANNEL_NAME,
-    FEED_CHECK_INTERVAL,
     ANNOUNCE_CHANNEL_NAME,
     WELCOME_CATEGORY_NAME,
+    STATS_REFRESH_INTERVAL,
+    SUBSCRIBED_EDIT_CONCURRENCY,
 )
-from sr.discord_bot.commands.join import join
+from sr.discord_bot.guild_index import GuildIndex
+from sr.discord_bot.commands.join import join, normalize_password
 from sr.discord_bot.commands.logs import logs
 from sr.discord_bot.commands.team import (
     Team,
@@ -29,6 +32,7 @@ from sr.discord_bot.commands.team import (
     delete_team,
     export_team,
     create_voice,
+    import_teams,
     repair_permissions,
     create_team_channel,
 )
@@ -37,7 +41,6 @@ from sr.discord_bot.commands.stats import (
     post_stats,
     stats_subscribe,
     SubscribedMessage,
-    SUBSCRIBE_MSG_FILE,
     load_subscribed_messages,
 )
 from sr.discord_bot.commands.passwd import passwd
@@ -45,7 +48,9 @@ from sr.discord_bot.commands.passwd import passwd
 
 class BotClient(discord.Client):
     logger: logging.Logger
+    state: StateStore
     guild: discord.Guild | discord.Object
+    guild_index: GuildIndex
     verified_role: discord.Role
     special_role: discord.Role
     volunteer_role: discord.Role
@@ -53,9 +58,19 @@ class BotClient(discord.Client):
     welcome_category: discord.CategoryChannel
     announce_channel: discord.TextChannel
     passwords: dict[str, str]
-    feed_channel: discord.TextChannel
-    teams_data: TeamsData = TeamsData([])
+    # Normalized password to the TLA it belongs to
+    password_index: dict[str, str]
+    # Normalized passwords used by more than one team, to the TLAs using them
+    password_collisions: dict[str, list[str]]
+    feed_reader: FeedReader
+    teams_data: TeamsData
     subscribed_messages: List[SubscribedMessage]
+    # Hash of the content last written to each subscribed message, by message ID
+    rendered_messages: dict[int, int]
+    _pending_update: asyncio.Task[None] | None
+    _shutdown: asyncio.Task[None] | None
+    # Rendered stats messages by options, with the teams_data generation they were rendered from
+    _stats_messages: dict[tuple[bool, bool, bool], tuple[int, str]]
 
     def __init__(
         self,
@@ -66,18 +81,26 @@ class BotClient(discord.Client):
     ):
         super().__init__(loop=loop, intents=intents)
         self.logger = logger
+        self.state = StateStore(logger)
         self.tree = app_commands.CommandTree(self)
         guild_id = os.getenv('DISCORD_GUILD_ID')
         if guild_id is None or not guild_id.isnumeric():
             self.logger.error("Invalid guild ID")
             exit(1)
         self.guild = discord.Object(id=int(guild_id))
+        self.guild_index = GuildIndex()
+        self.teams_data = TeamsData([])
+        self.rendered_messages = {}
+        self._pending_update = None
+        self._shutdown = None
+        self._stats_messages = {}
         team = Team()
         team.add_command(new_team)
         team.add_command(delete_team)
         team.add_command(create_voice)
         team.add_command(create_team_channel)
         team.add_command(export_team)
+        team.add_command(import_teams)
         team.add_command(repair_permissions)
         self.tree.add_command(team, guild=self.guild)
         stats = Stats()
@@ -89,12 +112,35 @@ class BotClient(discord.Client):
         self.tree.add_command(logs, guild=self.guild)
         self.load_passwords()
         load_subscribed_messages(self)
+        self.feed_reader = FeedReader(logger, self.state)
+        for url, event_name in self.state.unfinished_logs_jobs():
+            self.logger.warning(
+                f"Distributing logs from {url} for {event_name or 'today'} was interrupted, "
+                "run /logs again to send them to the remaining teams",
+            )
 
     async def setup_hook(self) -> None:
         # This copies the global commands over to your guild.
         self.tree.copy_global_to(guild=self.guild)
         await self.tree.sync(guild=self.guild)
-        self.check_for_new_blog_posts.start()
+
+        # docker stop sends SIGTERM, which would otherwise exit without saving queued state
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self._handle_sigterm)
+        except NotImplementedError:  # not supported on Windows
+            pass
+
+    def _handle_sigterm(self) -> None:
+        self.logger.info("Received SIGTERM, shutting down")
+        if self._shutdown is None:
+            self._shutdown = asyncio.create_task(self.close())
+
+    async def close(self) -> None:
+        await self.feed_reader.close()
+        # saved before disconnecting, as run() stops waiting for this once the client is closed
+        await self.state.flush()
+        await super().close()
+        await self.state.close()
 
     async def on_ready(self) -> None:
         self.logger.info(f"{self.user} has connected to Discord!")
@@ -103,14 +149,14 @@ class BotClient(discord.Client):
             logging.error(f"Guild {self.guild.id} not found!")
             exit(1)
         self.guild = guild
+        self.guild_index.rebuild(guild)
 
-        verified_role = discord.utils.get(guild.roles, name=VERIFIED_ROLE)
-        special_role = discord.utils.get(guild.roles, name=SPECIAL_ROLE)
-        volunteer_role = discord.utils.get(guild.roles, name=VOLUNTEER_ROLE)
-        supervisor_role = discord.utils.get(guild.roles, name=TEAM_LEADER_ROLE)
-        welcome_category = discord.utils.get(guild.categories, name=WELCOME_CATEGORY_NAME)
-        announce_channel = discord.utils.get(guild.text_channels, name=ANNOUNCE_CHANNEL_NAME)
-        feed_channel = discord.utils.get(guild.text_channels, name=FEED_CHANNEL_NAME)
+        verified_role = self.guild_index.role(VERIFIED_ROLE)
+        special_role = self.guild_index.role(SPECIAL_ROLE)
+        volunteer_role = self.guild_index.role(VOLUNTEER_ROLE)
+        supervisor_role = self.guild_index.role(TEAM_LEADER_ROLE)
+        welcome_category = self.guild_index.category(WELCOME_CATEGORY_NAME)
+        announce_channel = self.guild_index.text_channel(ANNOUNCE_CHANNEL_NAME)
 
         if (
             verified_role is None
@@ -119,7 +165,6 @@ class BotClient(discord.Client):
             or supervisor_role is None
             or welcome_category is None
             or announce_channel is None
-            or feed_channel is None
         ):
             logging.error("Roles and channels are not set up")
             exit(1)
@@ -130,11 +175,24 @@ class BotClient(discord.Client):
             self.supervisor_role = supervisor_role
             self.welcome_category = welcome_category
             self.announce_channel = announce_channel
-            self.feed_channel = feed_channel
+
+        if not self.feed_reader.running:  # on_ready is also called after reconnecting
+            self.feed_reader.start(self._feeds())
 
         self.teams_data.gen_team_memberships(self.guild, self.supervisor_role)
         await self.update_subscribed_messages()
 
+    def _feeds(self) -> List[Feed]:
+        """The followed feeds whose channels exist."""
+        feeds = []
+        for name, (url, channel_name) in FEEDS.items():
+            channel = self.guild_index.text_channel(channel_name)
+            if channel is None:
+                self.logger.error(f"Channel #{channel_name} for the {name} feed is not set up")
+                continue
+            feeds.append(Feed(name, url, channel))
+        return feeds
+
     async def on_member_join(self, member: discord.Member) -> None:
         name = member.display_name
         self.logger.info(f"Member {name} joined")
@@ -161,9 +219,14 @@ To gain access, you must use `/join` with the password for your group.
         self.logger.info(f"Created welcome channel for '{name}'")
 
     async def on_member_remove(self, member: discord.Member) -> None:
+        if not self._is_bot_guild(member.guild):
+            return
         name = member.display_name
         self.logger.info(f"Member '{name}' left")
 
+        if self.teams_data.remove_member(member, self.supervisor_role):
+            self.schedule_subscribed_update()
+
         if self.verified_role in member.roles:
             return
 
@@ -175,10 +238,59 @@ To gain access, you must use `/join` with the password for your group.
 
     async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
         """Update subscribed messages when a member's roles change."""
+        if not self._is_bot_guild(after.guild):
+            return
+        if self.teams_data.update_member(before, after, self.supervisor_role):
+            self.schedule_subscribed_update()
+
+    def _is_bot_guild(self, guild: discord.Guild) -> bool:
+        """Whether an event is from the bot's guild, once it's ready."""
+        return isinstance(self.guild, discord.Guild) and guild.id == self.guild.id
+
+    async def on_guild_role_create(self, role: discord.Role) -> None:
+        if not self._is_bot_guild(role.guild):
+            return
+        self.guild_index.add_role(role)
+        if role.name.startswith(ROLE_PREFIX):
+            await self._regenerate_team_memberships()
+
+    async def on_guild_role_delete(self, role: discord.Role) -> None:
+        if not self._is_bot_guild(role.guild):
+            return
+        self.guild_index.remove_role(role)
+        if role.name.startswith(ROLE_PREFIX):
+            await self._regenerate_team_memberships()
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
+        if not self._is_bot_guild(after.guild):
+            return
+        self.guild_index.update_role(before, after)
+        if before.name != after.name and (
+            before.name.startswith(ROLE_PREFIX) or after.name.startswith(ROLE_PREFIX)
+        ):
+            await self._regenerate_team_memberships()
+
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel) -> None:
+        if self._is_bot_guild(channel.guild):
+            self.guild_index.add_channel(channel)
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        if self._is_bot_guild(channel.guild):
+            self.guild_index.remove_channel(channel)
+
+    async def on_guild_channel_update(
+        self,
+        before: discord.abc.GuildChannel,
+        after: discord.abc.GuildChannel,
+    ) -> None:
+        if self._is_bot_guild(after.guild):
+            self.guild_index.update_channel(before, after)
+
+    async def _regenerate_team_memberships(self) -> None:
+        """Rebuild team memberships after the set of team roles has changed."""
         if isinstance(self.guild, discord.Guild):
             self.teams_data.gen_team_memberships(self.guild, self.supervisor_role)
-
-            await self.update_subscribed_messages()
+            self.schedule_subscribed_update()
 
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
         """Remove subscribed messages by reacting with a cross mark."""
@@ -198,99 +310,155 @@ To gain access, you must use `/join` with the password for your group.
             SubscribedMessage(payload.channel_id, payload.message_id),
         )
 
-    def _save_subscribed_messages(self) -> None:
-        """Save subscribed messages to file."""
-        with open(SUBSCRIBE_MSG_FILE, 'w') as f:
-            json.dump(
-                [x._asdict() for x in self.subscribed_messages],
-                f,
-            )
-
-    @tasks.loop(seconds=FEED_CHECK_INTERVAL)
-    async def check_for_new_blog_posts(self) -> None:
-        self.logger.info("Checking for new blog posts")
-        await check_posts(self.feed_channel)
-
-    @check_for_new_blog_posts.before_loop
-    async def before_check_for_new_blog_posts(self) -> None:
-        await self.wait_until_ready()
-
     def load_passwords(self) -> None:
-        """
-        Returns a mapping from role name to the password for that role.
-
-        The format should be as follows:
-        ```
-        teamname:password
-        ```
-        """
-        try:
-            with open('passwords.json') as f:
-                self.passwords = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            with open('passwords.json', 'w') as f:
-                f.write('{}')
-                self.passwords = {}
+        """Load the mapping from TLA to the password for that team."""
+        self.passwords = self.state.passwords()
+        self._index_passwords()
 
     def set_password(self, tla: str, password: str) -> None:
         self.passwords[tla.upper()] = password
-        with open('passwords.json', 'w') as f:
-            json.dump(self.passwords, f)
+        self.state.set_password(tla.upper(), password)
+        self._index_passwords()
+
+    def set_passwords(self, passwords: dict[str, str]) -> None:
+        """Set the passwords of several teams, saving them together."""
+        passwords = {tla.upper(): password for tla, password in passwords.items()}
+        self.passwords.update(passwords)
+        self.state.set_passwords(passwords)
+        self._index_passwords()
 
     def remove_password(self, tla: str) -> None:
         del self.passwords[tla.upper()]
-        with open('passwords.json', 'w') as f:
-            json.dump(self.passwords, f)
+        self.state.remove_password(tla.upper())
+        self._index_passwords()
+
+    def shared_password_tlas(self, tla: str) -> list[str]:
+        """Other teams which have the same password as the given team."""
+        password = self.passwords.get(tla.upper())
+        if password is None:
+            return []
+        tlas = self.password_collisions.get(normalize_password(password), [])
+        return [other for other in tlas if other != tla.upper()]
+
+    def shared_password_warning(self, tlas: Iterable[str]) -> str:
+        """Lines to add to a reply, warning about each of the given teams whose password another team also has."""
+        return ''.join(
+            f"\n**Warning:** {tla.upper()} has the same password as {', '.join(shared_with)}, "
+            "it won't be accepted until it's changed."
+            for tla in tlas
+            if (shared_with := self.shared_password_tlas(tla))
+        )
+
+    def _index_passwords(self) -> None:
+        """Rebuild the lookup of teams by normalized password."""
+        index: dict[str, str] = {}
+        collisions: dict[str, list[str]] = {}
+        for tla, password in self.passwords.items():
+            key = normalize_password(password)
+            if key in collisions:
+                collisions[key].append(tla)
+            elif key in index:
+                collisions[key] = [index.pop(key), tla]
+            else:
+                index[key] = tla
+
+        for tlas in collisions.values():
+            self.logger.warning(f"Teams {', '.join(tlas)} have the same password, it will not be accepted")
+
+        self.password_index = index
+        self.password_collisions = collisions
 
     def stats_message(self, members: bool = True, warnings: bool = True, statistics: bool = False) -> str:
         """Generate a message string for the given options."""
-        return '\n\n'.join([
+        options = (members, warnings, statistics)
+        generation = self.teams_data.generation
+        cached = self._stats_messages.get(options)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
+        message = '\n\n'.join([
             *([self.teams_data.team_summary()] if members else []),
             *([self.teams_data.warnings()] if warnings else []),
             *([self.teams_data.statistics()] if statistics else []),
         ])
+        self._stats_messages[options] = (generation, message)
+        return message
 
     def add_subscribed_message(self, msg: SubscribedMessage) -> None:
         """Add a subscribed message to the subscribed list."""
         self.subscribed_messages.append(msg)
-        self._save_subscribed_messages()
+        self.state.add_subscribed_message(*msg)
 
     async def remove_subscribed_message(self, msg: SubscribedMessage) -> None:
         """Remove a subscribed message from the channel and subscribed list."""
-        msg_channel = await self.fetch_channel(msg.channel_id)
-        if not hasattr(msg_channel, 'fetch_message'):
-            # ignore for channels that don't support message editing
-            return
-
         try:
-            message = await msg_channel.fetch_message(msg.message_id)
-            chan_name = message.channel.name if hasattr(message.channel, 'name') else 'unknown channel'
-            self.logger.info(f'Removing message in {chan_name} from {message.author.name}')
-            await message.delete()  # remove message from discord
+            self.logger.info(f'Removing message #{msg.message_id} in {self._channel_name(msg.channel_id)}')
+            await self._partial_message(msg).delete()  # remove message from discord
         except discord.errors.NotFound:
             self.logger.info(f"Message #{msg.message_id} doesn't exist, removing from subscribed messages")
 
-        # remove message from subscription list and save to file
-        self.subscribed_messages.remove(msg)
-        self._save_subscribed_messages()
+        self._drop_subscribed_message(msg)
+
+    def _drop_subscribed_message(self, msg: SubscribedMessage) -> None:
+        """Remove a message from the subscription list and the bot's state."""
+        if msg in self.subscribed_messages:
+            self.subscribed_messages.remove(msg)
+        self.rendered_messages.pop(msg.message_id, None)
+        self.state.remove_subscribed_message(msg.message_id)
+
+    def _partial_message(self, msg: SubscribedMessage) -> discord.PartialMessage:
+        """A handle to a subscribed message which can be edited without fetching it."""
+        return self.get_partial_messageable(msg.channel_id).get_partial_message(msg.message_id)
+
+    def _channel_name(self, channel_id: int) -> str:
+        channel = self.get_channel(channel_id)
+        return channel.name if channel is not None and hasattr(channel, 'name') else 'unknown channel'
+
+    def schedule_subscribed_update(self) -> None:
+        """
+        Update all subscribed messages after a short delay.
+
+        Any further changes before the update runs are included in the same update.
+        """
+        if self._pending_update is None:
+            self._pending_update = asyncio.create_task(self._delayed_subscribed_update())
+
+    async def _delayed_subscribed_update(self) -> None:
+        await asyncio.sleep(STATS_REFRESH_INTERVAL)
+        # Changes from this point on need a new update
+        self._pending_update = None
+        try:
+            await self.update_subscribed_messages()
+        except Exception:
+            self.logger.exception('Failed to update subscribed messages')
 
     async def update_subscribed_messages(self) -> None:
-        """Update all subscribed messages."""
+        """Update all subscribed messages whose content has changed."""
         self.logger.info('Updating subscribed messages')
-        for sub_msg in self.subscribed_messages:  # edit all subscribed messages
-            message = self.stats_message(
-                sub_msg.members,
-                sub_msg.warnings,
-                sub_msg.stats,
-            )
-            message = f"```\n{message}\n```"
+        limit = asyncio.Semaphore(SUBSCRIBED_EDIT_CONCURRENCY)
+        await asyncio.gather(*(  # edit all subscribed messages
+            self._update_subscribed_message(sub_msg, limit)
+            for sub_msg in list(self.subscribed_messages)
+        ))
+
+    async def _update_subscribed_message(self, sub_msg: SubscribedMessage, limit: asyncio.Semaphore) -> None:
+        message = self.stats_message(
+            sub_msg.members,
+            sub_msg.warnings,
+            sub_msg.stats,
+        )
+        message = f"```\n{message}\n```"
+        content_hash = hash(message)
+        if self.rendered_messages.get(sub_msg.message_id) == content_hash:
+            return
 
+        async with limit:
             try:
-                msg_channel = await self.fetch_channel(sub_msg.channel_id)
-                if not hasattr(msg_channel, 'fetch_message'):
-                    # ignore for channels that don't support message editing
-                    continue
-                msg = await msg_channel.fetch_message(sub_msg.message_id)
-                await msg.edit(content=message)
+                await self._partial_message(sub_msg).edit(content=message)
             except discord.errors.NotFound:  # message is no longer available
-                await self.remove_subscribed_message(sub_msg)
+                self.logger.info(f"Message #{sub_msg.message_id} doesn't exist, removing from subscribed messages")
+                self._drop_subscribed_message(sub_msg)
+            except discord.HTTPException as e:
+                self.logger.error(f"Unable to update message #{sub_msg.message_id}: {e}")
+            else:
+                self.rendered_messages[sub_msg.message_id] = content_hash
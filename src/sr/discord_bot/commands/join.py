@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import Tuple, NamedTuple, TYPE_CHECKING
 
 import discord
 from discord import app_commands
@@ -11,11 +11,21 @@ from sr.discord_bot.constants import (
     SPECIAL_ROLE,
     SPECIAL_TEAM,
     CHANNEL_PREFIX,
+    PASSWORDS_CHANNEL_NAME,
 )
 
 REASON = "A correct password was entered."
 
 
+class PasswordMatch(NamedTuple):
+    """The team an entered password is for."""
+
+    # the only team with the password
+    team: str | None = None
+    # every team with the password, if more than one has it
+    shared_by: Tuple[str, ...] = ()
+
+
 @discord.app_commands.command(  # type:ignore[arg-type]
     name='join',
     description='Use your password to join the server under your team',
@@ -38,8 +48,15 @@ async def join(interaction: discord.Interaction["BotClient"], password: str) ->
     ):
         return
 
-    chosen_team = find_team(interaction.client, member, password)
-    if chosen_team:
+    match = find_team(interaction.client, member, password)
+    chosen_team = match.team
+    if match.shared_by:
+        await interaction.response.send_message(
+            "That password is used by more than one team, so we can't tell which team you're from. "
+            "Please contact a volunteer.",
+        )
+        await report_shared_password(interaction.client, member, match.shared_by)
+    elif chosen_team:
         if chosen_team == SPECIAL_TEAM:
             role_name = SPECIAL_ROLE
         else:
@@ -55,7 +72,7 @@ async def join(interaction: discord.Interaction["BotClient"], password: str) ->
             role_name = f"{ROLE_PREFIX}{chosen_team}"
 
         # Add them to that specific role
-        specific_role = discord.utils.get(guild.roles, name=role_name)
+        specific_role = interaction.client.guild_index.role(role_name)
         if specific_role is None:
             interaction.client.logger.error(f"Specified role '{chosen_team}' does not exist")
         else:
@@ -80,19 +97,42 @@ async def join(interaction: discord.Interaction["BotClient"], password: str) ->
         await interaction.response.send_message("Incorrect password.")
 
 
-def find_team(client: "BotClient", member: discord.Member, entered: str) -> str | None:
-    entered = (entered.lower()
-               .replace(" ", "-")
-               .replace("_", "-")
-               # German layout typos:
-               .replace("/", "-")
-               .replace("ß", "-"))
+def normalize_password(password: str) -> str:
+    return (password.lower()
+            .replace(" ", "-")
+            .replace("_", "-")
+            # German layout typos:
+            .replace("/", "-")
+            .replace("ß", "-"))
 
-    for team_name, password in client.passwords.items():
-        if entered == password:
-            client.logger.info(
-                f"'{member.name}' entered the correct password for {team_name}",
-            )
-            # Password was correct!
-            return team_name
-    return ""
+
+def find_team(client: "BotClient", member: discord.Member, entered: str) -> PasswordMatch:
+    entered = normalize_password(entered)
+
+    if entered in client.password_collisions:
+        shared_by = client.password_collisions[entered]
+        client.logger.error(
+            f"'{member.name}' entered the password shared by {', '.join(shared_by)}",
+        )
+        return PasswordMatch(shared_by=tuple(shared_by))
+
+    team_name = client.password_index.get(entered)
+    if team_name is not None:
+        client.logger.info(
+            f"'{member.name}' entered the correct password for {team_name}",
+        )
+        # Password was correct!
+        return PasswordMatch(team_name)
+    return PasswordMatch()
+
+
+async def report_shared_password(client: "BotClient", member: discord.Member, shared_by: Tuple[str, ...]) -> None:
+    """Let volunteers know a member couldn't join because their password is used by several teams."""
+    channel = client.guild_index.text_channel(PASSWORDS_CHANNEL_NAME)
+    if channel is None:
+        client.logger.error(f"Can't report the shared password, #{PASSWORDS_CHANNEL_NAME} does not exist")
+        return
+    await channel.send(
+        f"{member.mention} entered the password shared by {', '.join(shared_by)}, "
+        "so couldn't join a team. Please give each of these teams a different password.",
+    )
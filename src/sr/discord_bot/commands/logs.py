@@ -1,25 +1,47 @@
+import io
 import os
 import re
 import sys
+import copy
+import time
 import shutil
+import struct
+import asyncio
 import logging
 import tempfile
 from enum import Enum
-from typing import IO, cast, List, Tuple, TYPE_CHECKING
+from typing import IO, Set, cast, Dict, List, Tuple, NamedTuple, TYPE_CHECKING
 from pathlib import Path
-from zipfile import ZipFile, BadZipFile, is_zipfile, ZIP_DEFLATED
+from zipfile import ZipFile, ZipInfo, BadZipFile, is_zipfile, ZIP_DEFLATED
 from datetime import date
+from collections import defaultdict
 
 import aiohttp
 import discord
 from discord import app_commands
 
-from sr.discord_bot.constants import TEAM_CHANNEL_PREFIX
+from sr.discord_bot.state import StateStore
+from sr.discord_bot.constants import (
+    LOGS_CACHE_DIR,
+    LOGS_CACHE_SIZE,
+    TEAM_CHANNEL_PREFIX,
+    LOGS_MAX_DOWNLOAD_SIZE,
+    LOGS_UPLOAD_CONCURRENCY,
+)
+from sr.discord_bot.download_cache import DownloadCache
 
 if TYPE_CHECKING:
     from sr.discord_bot.bot import BotClient
 
 
+# ZIP format details used to copy compressed members between archives
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+LOCAL_HEADER_SIZE = 30
+CENTRAL_HEADER_SIZE = 46
+END_RECORD_SIZE = 22
+DATA_DESCRIPTOR_FLAG = 0x08
+
+
 class AnimationHandling(Enum):
     none = 0
     team = 1
@@ -41,6 +63,23 @@ if DISCORD_TESTING or DISCORD_DEBUG:
     logger.setLevel(logging.DEBUG)
     handler.setLevel(logging.DEBUG)
 
+DOWNLOAD_CHUNK_SIZE = 1024 ** 2
+DOWNLOAD_PROGRESS_INTERVAL = 5  # in seconds
+# Largest file sent while testing, as no files are actually uploaded
+TESTING_UPLOAD_LIMIT = 8 * 1000 ** 2
+
+download_cache = DownloadCache(logger, LOGS_CACHE_DIR, LOGS_CACHE_SIZE)
+
+
+def _mib(size: int) -> str:
+    return f"{size / 1024 ** 2:.1f} MiB"
+
+
+def _download_status_msg(downloaded: int, total_size: int | None) -> str:
+    if total_size is None:
+        return f"Downloading logs... {_mib(downloaded)}"
+    return f"Downloading logs... {_mib(downloaded)} of {_mib(total_size)}"
+
 
 async def log_and_reply(ctx: discord.interactions.Interaction["BotClient"], error_str: str) -> None:
     logger.error(error_str)
@@ -66,10 +105,10 @@ async def get_channel(
     # get team's channel by name
     if guild is None:
         raise app_commands.NoPrivateMessage
-    channel = discord.utils.get(
-        guild.channels,
-        name=channel_name,
-    )
+    if guild.id == ctx.client.guild.id:
+        channel = ctx.client.guild_index.channel(channel_name)
+    else:  # the testing guild isn't indexed
+        channel = discord.utils.get(guild.channels, name=channel_name)
 
     if not channel:
         await log_and_reply(
@@ -87,26 +126,57 @@ async def get_channel(
     return channel
 
 
+def archive_tla(archive_name: str) -> str | None:
+    # extract team name from filename
+    tla_search = re.match(TEAM_CHANNEL_PREFIX + r'(.*?)[-.]', archive_name)
+    if not isinstance(tla_search, re.Match):
+        return None
+    return tla_search.group(1)
+
+
 async def get_team_channel(
     ctx: discord.interactions.Interaction["BotClient"],
     archive_name: str,
     zip_name: str,
 ) -> Tuple[str, discord.TextChannel | None]:
-    # extract team name from filename
-    tla_search = re.match(TEAM_CHANNEL_PREFIX + r'(.*?)[-.]', archive_name)
-    if not isinstance(tla_search, re.Match):
+    tla = archive_tla(archive_name)
+    if tla is None:
         await log_and_reply(
             ctx,
             f"# Failed to extract a TLA from {archive_name} in {zip_name}",
         )
         return '', None
 
-    tla = tla_search.group(1)
     channel = await get_channel(ctx, f"{TEAM_CHANNEL_PREFIX}{tla}")
 
     return tla, channel
 
 
+class UploadJournal(NamedTuple):
+    """
+    Records which teams have been sent the logs from a URL for an event.
+
+    Distributing the same logs again skips those teams, so an interrupted
+    distribution continues where it stopped.
+    """
+
+    state: StateStore
+    url: str
+    event_name: str
+
+    async def start(self, restart: bool) -> Set[str]:
+        """Record the start of a distribution, returning the TLAs of teams which already have the logs."""
+        completed = set() if restart else await self.state.logs_job_teams(self.url, self.event_name)
+        self.state.start_logs_job(self.url, self.event_name, restart)
+        return completed
+
+    def team_completed(self, tla: str) -> None:
+        self.state.add_logs_job_team(self.url, self.event_name, tla)
+
+    def finish(self) -> None:
+        self.state.finish_logs_job(self.url, self.event_name)
+
+
 def pre_test_zipfile(archive_name: str, zip_name: str) -> bool:
     if not archive_name.lower().endswith('.zip'):  # skip non-zips
         logger.debug(f"{archive_name} from {zip_name} is not a ZIP, skipping")
@@ -122,57 +192,248 @@ def pre_test_zipfile(archive_name: str, zip_name: str) -> bool:
     return True
 
 
-def match_animation_files(log_name: str, animation_dir: Path) -> List[Path]:
-    match_num_search = re.search(r'match-([0-9]+)', log_name)
-    if not isinstance(match_num_search, re.Match):
-        logger.warning(f'Invalid match name: {log_name}')
-        return []
-    match_num = match_num_search[1]
-    logger.debug(f"Fetching animation files for match {match_num}")
-    match_files = animation_dir.glob(f'match-{match_num}.*')
-    return [data_file for data_file in match_files if data_file.suffix != '.mp4']
+class TeamAnimations(NamedTuple):
+    """Animation files to add to each team's archive, compressed once for all teams."""
 
+    # archive of the animation files and textures, copied into team archives without recompressing
+    shared: ZipFile
+    # members of the shared archive for each match number
+    matches: Dict[str, List[ZipInfo]]
+    textures: List[ZipInfo]
 
-def insert_match_files(archive: Path, animation_dir: Path) -> None:
-    # append animations to archive
-    with ZipFile(archive, 'a', compression=ZIP_DEFLATED) as zipfile:
-        for log_name in zipfile.namelist():
-            if not log_name.endswith('.txt'):
-                continue
 
-            for animation_file in match_animation_files(log_name, animation_dir):
+def compress_animations(animation_dir: Path, shared_archive: Path) -> TeamAnimations:
+    """Compress the animation files and textures added to team archives into a shared archive."""
+    with ZipFile(shared_archive, 'w', compression=ZIP_DEFLATED) as zipfile:
+        for animation_file in animation_dir.glob('match-*.*'):
+            if animation_file.suffix != '.mp4':
                 zipfile.write(animation_file.resolve(), animation_file.name)
 
-        # add textures subtree
         for texture in (animation_dir / 'textures').glob('**/*'):
             zipfile.write(
                 texture.resolve(),
                 texture.relative_to(animation_dir),
             )
 
+    # index the shared archive so team archives only need lookups
+    shared = ZipFile(shared_archive)
+    matches: Dict[str, List[ZipInfo]] = defaultdict(list)
+    textures = []
+    for info in shared.infolist():
+        if info.filename.startswith('textures/'):
+            textures.append(info)
+        elif match_num_search := re.match(r'match-([0-9]+)\.', info.filename):
+            matches[match_num_search[1]].append(info)
+
+    return TeamAnimations(shared, dict(matches), textures)
+
+
+def match_animation_files(log_name: str, animations: TeamAnimations) -> List[ZipInfo]:
+    match_num_search = re.search(r'match-([0-9]+)', log_name)
+    if not isinstance(match_num_search, re.Match):
+        logger.warning(f'Invalid match name: {log_name}')
+        return []
+    match_num = match_num_search[1]
+    logger.debug(f"Fetching animation files for match {match_num}")
+    return animations.matches.get(match_num, [])
+
+
+def copy_compressed_member(source: ZipFile, info: ZipInfo, dest: ZipFile) -> None:
+    """Append a member of one archive to another, copying its compressed data as-is."""
+    if source.fp is None or dest.fp is None:
+        raise ValueError("Archives must be open to copy between them")
+
+    # the compressed data follows the member's local header
+    source.fp.seek(info.header_offset)
+    header = source.fp.read(LOCAL_HEADER_SIZE)
+    if header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise BadZipFile(f"Bad local header for {info.filename}")
+    name_length, extra_length = struct.unpack('<HH', header[-4:])
+    source.fp.seek(info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length)
+    data = source.fp.read(info.compress_size)
+
+    new_info = copy.copy(info)
+    new_info.flag_bits &= ~DATA_DESCRIPTOR_FLAG  # the sizes and CRC are known up front
+
+    dest.fp.seek(dest.start_dir)
+    new_info.header_offset = dest.fp.tell()
+    dest.fp.write(new_info.FileHeader())
+    dest.fp.write(data)
+    dest.start_dir = dest.fp.tell()
+    dest.filelist.append(new_info)
+    dest.NameToInfo[new_info.filename] = new_info
+    # ZipFile only writes the central directory on close when it has been modified
+    setattr(dest, '_didModify', True)
+
+
+class ArchiveMember(NamedTuple):
+    """A member of an open archive, to be copied into another."""
+
+    source: ZipFile
+    info: ZipInfo
+
+    @property
+    def packed_size(self) -> int:
+        """The size this member adds to an archive, including its headers."""
+        info = self.info
+        name_size = len(info.filename.encode())
+        return (
+            LOCAL_HEADER_SIZE + CENTRAL_HEADER_SIZE
+            + 2 * (name_size + len(info.extra))
+            + len(info.comment)
+            + info.compress_size
+        )
+
+
+def team_archive_groups(
+    team_zip: ZipFile,
+    animations: TeamAnimations | None,
+) -> List[List[ArchiveMember]]:
+    """Group each match log with its animation files, which should be uploaded together."""
+    groups = []
+    for info in team_zip.infolist():
+        group = [ArchiveMember(team_zip, info)]
+        if animations is not None and info.filename.endswith('.txt'):
+            group.extend(
+                ArchiveMember(animations.shared, animation_info)
+                for animation_info in match_animation_files(info.filename, animations)
+            )
+        groups.append(group)
+    return groups
+
+
+def plan_archive_parts(
+    groups: List[List[ArchiveMember]],
+    common: List[ArchiveMember],
+    size_limit: int,
+) -> Tuple[List[List[ArchiveMember]], List[str]]:
+    """
+    Pack groups of members, in order, into as few archives as fit within the size limit.
+
+    The common members are added to every archive holding a group with more
+    than one member. Where a group would not fit in an archive of its own, only
+    its first member is kept.
+    Returns the members of each archive and the names of the trimmed groups.
+    """
+    common_size = sum(member.packed_size for member in common)
+    parts: List[List[ArchiveMember]] = []
+    trimmed = []
+    part: List[ArchiveMember] = []
+    part_size = END_RECORD_SIZE
+    part_has_common = False
+
+    for group in groups:
+        group_size = sum(member.packed_size for member in group)
+        if len(group) > 1 and END_RECORD_SIZE + common_size + group_size > size_limit:
+            trimmed.append(group[0].info.filename)
+            group = group[:1]
+            group_size = group[0].packed_size
+
+        needs_common = len(group) > 1
+        if part and part_size + group_size + (needs_common and not part_has_common) * common_size > size_limit:
+            parts.append(part + common if part_has_common else part)
+            part = []
+            part_size = END_RECORD_SIZE
+            part_has_common = False
+
+        if needs_common and not part_has_common:
+            part_size += common_size
+            part_has_common = True
+        part.extend(group)
+        part_size += group_size
+
+    if part or not parts:
+        parts.append(part + common if part_has_common else part)
+    return parts, trimmed
+
+
+def write_archive(members: List[ArchiveMember]) -> bytes:
+    buffer = io.BytesIO()
+    with ZipFile(buffer, 'w') as zipfile:
+        for member in members:
+            copy_compressed_member(member.source, member.info, zipfile)
+    return buffer.getvalue()
+
+
+class Upload(NamedTuple):
+    """A file to upload, either held in memory or on disk."""
+
+    name: str
+    data: bytes | Path
+
+    @property
+    def size(self) -> int:
+        if isinstance(self.data, bytes):
+            return len(self.data)
+        return self.data.stat().st_size
+
+    def file(self) -> discord.File:
+        if isinstance(self.data, bytes):
+            return discord.File(io.BytesIO(self.data), filename=self.name)
+        return discord.File(str(self.data), filename=self.name)
+
+
+class TeamArchive(NamedTuple):
+    """A team's archive from the logs archive, held in memory."""
+
+    name: str
+    # the archive as it was in the logs archive
+    logs: bytes
+    # the archives to upload, including any animation files, each within the upload limit
+    parts: List[bytes]
+    # match logs whose animation files were too large to upload
+    trimmed: List[str]
+
+    @property
+    def repacked(self) -> bool:
+        return len(self.parts) > 1 or self.parts[0] is not self.logs
+
+    def uploads(self) -> List[Tuple[Upload, str]]:
+        """The files to upload and the message to send with each."""
+        if len(self.parts) == 1:
+            return [(Upload(self.name, self.parts[0]), "Here are your logs")]
+
+        stem, suffix = os.path.splitext(self.name)
+        return [
+            (
+                Upload(f"{stem}-part{number}{suffix}", part),
+                f"Here is part {number} of {len(self.parts)} of your logs",
+            )
+            for number, part in enumerate(self.parts, start=1)
+        ]
+
+
+def upload_size_limit(guild: discord.Guild | None) -> int:
+    """The largest file which can be uploaded, in bytes."""
+    if DISCORD_TESTING:
+        return TESTING_UPLOAD_LIMIT
+    if guild is None:
+        return discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES
+    return guild.filesize_limit
+
 
 async def send_file(
     ctx: discord.interactions.Interaction["BotClient"],
     channel: discord.TextChannel,
-    archive: Path,
+    archive: Upload,
     event_name: str,
     msg_str: str = "Here are your logs",
     logging_str: str = "Uploaded logs",
 ) -> bool:
     try:
         if DISCORD_TESTING:  # don't actually send message in testing
-            if (archive.stat().st_size / 1000 ** 2) > 8:
+            if archive.size > TESTING_UPLOAD_LIMIT:
                 # discord.HTTPException requires aiohttp.ClientResponse
                 await log_and_reply(
                     ctx,
                     f"# {archive.name} was too large to upload at "
-                    f"{archive.stat().st_size / 1000 ** 2 :.3f} MiB",
+                    f"{archive.size / 1000 ** 2 :.3f} MiB",
                 )
                 return False
         else:
             await channel.send(
                 content=f"{msg_str} from {event_name if event_name else 'today'}",
-                file=discord.File(str(archive)),
+                file=archive.file(),
             )
         logger.debug(
             f"{logging_str} from {event_name if event_name else 'today'}",
@@ -182,7 +443,7 @@ async def send_file(
             await log_and_reply(
                 ctx,
                 f"# {archive.name} was too large to upload at "
-                f"{archive.stat().st_size / 1000 ** 2 :.3f} MiB",
+                f"{archive.size / 1000 ** 2 :.3f} MiB",
             )
             return False
         else:
@@ -216,78 +477,220 @@ def extract_animations(zipfile: ZipFile, tmpdir: Path, fully_extract: bool) -> b
     return True
 
 
+def read_team_archive(
+    zipfile: ZipFile,
+    archive_name: str,
+    animations: TeamAnimations | None,
+    size_limit: int,
+) -> TeamArchive | None:
+    """
+    Read a team's archive, adding the animation files for its matches if given.
+
+    Archives larger than the size limit are split into parts, keeping each
+    match's log with its animation files.
+    Returns None if the team's archive is not a valid ZIP file.
+    """
+    logs = zipfile.read(archive_name)
+    name = Path(archive_name).name
+
+    if not is_zipfile(io.BytesIO(logs)):  # test file is a valid zip
+        return None
+
+    if animations is None and len(logs) <= size_limit:
+        return TeamArchive(name, logs, [logs], [])
+
+    with ZipFile(io.BytesIO(logs)) as team_zip:
+        textures = [] if animations is None else [
+            ArchiveMember(animations.shared, info) for info in animations.textures
+        ]
+        parts, trimmed = plan_archive_parts(
+            team_archive_groups(team_zip, animations),
+            textures,
+            size_limit,
+        )
+        return TeamArchive(name, logs, [write_archive(part) for part in parts], trimmed)
+
+
+async def prepare_team_upload(
+    ctx: discord.interactions.Interaction["BotClient"],
+    zipfile: ZipFile,
+    archive_name: str,
+    zip_name: str,
+    animations: TeamAnimations | None,
+    size_limit: int,
+) -> Tuple[str, discord.TextChannel, TeamArchive] | None:
+    """Read a team's archive and find the channel to upload it to."""
+    archive = await asyncio.to_thread(read_team_archive, zipfile, archive_name, animations, size_limit)
+    if archive is None:
+        await log_and_reply(
+            ctx,
+            f"# {archive_name} from {zip_name} is not a valid ZIP file",
+        )
+        return None
+
+    # get team's channel
+    tla, channel = await get_team_channel(ctx, archive_name, zip_name)
+    if not channel:
+        return None
+    return tla, channel, archive
+
+
+async def upload_team_archive(
+    ctx: discord.interactions.Interaction["BotClient"],
+    archive: TeamArchive,
+    tla: str,
+    channel: discord.TextChannel,
+    event_name: str,
+    journal: UploadJournal,
+    upload_limit: asyncio.Semaphore,
+    size_limit: int,
+) -> bool:
+    """
+    Upload a team's archive to their channel, releasing the upload limit when done.
+
+    Returns whether the full archive was uploaded.
+    """
+    try:
+        sent = 0
+        # upload to team channel with message
+        # discord.py waits for the rate limit of each channel before sending
+        for upload, msg_str in archive.uploads():
+            if not await send_file(
+                ctx,
+                channel,
+                upload,
+                event_name,
+                msg_str=msg_str,
+                logging_str=f"Uploaded {upload.name} for {tla}",
+            ):
+                break
+            sent += 1
+        else:
+            if archive.trimmed:
+                await log_and_reply(
+                    ctx,
+                    f"Animations for {', '.join(archive.trimmed)} were too large "
+                    f"to upload for {tla}",
+                )
+            journal.team_completed(tla)
+            return True
+
+        # try again without animations, unless the team already has some of the parts
+        # TODO test this clause in unit testing
+        if archive.repacked and sent == 0 and len(archive.logs) <= size_limit:
+            if await send_file(  # retry with original archive
+                ctx,
+                channel,
+                Upload(archive.name, archive.logs),
+                event_name,
+                logging_str=f"Uploaded only logs for {tla}",
+            ):
+                await log_and_reply(
+                    ctx,
+                    f"Only able to upload logs for {tla}, "
+                    "no animations were served",
+                )
+        elif len(archive.parts) > 1:
+            missing = ', '.join(str(number) for number in range(sent + 1, len(archive.parts) + 1))
+            await log_and_reply(
+                ctx,
+                f"# Only uploaded {sent} of {len(archive.parts)} parts of the logs for {tla}, "
+                f"part(s) {missing} are missing",
+            )
+        return False
+    except discord.HTTPException as e:
+        await log_and_reply(ctx, f"# Failed to upload logs for {tla}: {e}")
+        return False
+    finally:
+        upload_limit.release()
+
+
 async def logs_upload(
     ctx: discord.interactions.Interaction["BotClient"],
     file: IO[bytes],
     zip_name: str,
     event_name: str,
     team_animation: AnimationHandling,  # None = don't upload animations
+    journal: UploadJournal,
+    restart: bool = False,
 ) -> None:
     animations_found = False
+    previous_tlas = await journal.start(restart)
+    skipped_tlas = []
     try:
         with tempfile.TemporaryDirectory() as tmpdir_name:
             tmpdir = Path(tmpdir_name)
-            completed_tlas = []
 
-            with ZipFile(file) as zipfile:
+            # All archive work is done in worker threads to keep the event loop free
+            with await asyncio.to_thread(lambda: ZipFile(file)) as zipfile:
                 if team_animation != AnimationHandling.none:
-                    animations_found = extract_animations(zipfile, tmpdir, team_animation == AnimationHandling.team)
+                    animations_found = await asyncio.to_thread(
+                        extract_animations,
+                        zipfile,
+                        tmpdir,
+                        team_animation == AnimationHandling.team,
+                    )
 
                     if not animations_found:
                         await log_and_reply(ctx, "animations Zip file is missing")
 
-                for archive_name in zipfile.namelist():
-                    if not pre_test_zipfile(archive_name, zip_name):
-                        continue
-
-                    zipfile.extract(archive_name, path=tmpdir)
+                animations = None
+                if team_animation == AnimationHandling.team and animations_found:
+                    animations = await asyncio.to_thread(
+                        compress_animations,
+                        tmpdir / 'animations',
+                        tmpdir / 'shared-animations.zip',
+                    )
 
-                    if not is_zipfile(tmpdir / archive_name):  # test file is a valid zip
-                        await log_and_reply(
+                # The next archive is prepared while up to LOGS_UPLOAD_CONCURRENCY uploads are in progress
+                upload_limit = asyncio.Semaphore(LOGS_UPLOAD_CONCURRENCY)
+                size_limit = upload_size_limit(ctx.guild)
+                uploads: List[Tuple[str, asyncio.Task[bool]]] = []
+                try:
+                    for archive_name in zipfile.namelist():
+                        if not pre_test_zipfile(archive_name, zip_name):
+                            continue
+
+                        tla = archive_tla(archive_name)
+                        if tla in previous_tlas:
+                            logger.debug(f"{tla} already has logs from {event_name or 'today'}, skipping")
+                            skipped_tlas.append(tla)
+                            continue
+
+                        upload = await prepare_team_upload(
                             ctx,
-                            f"# {archive_name} from {zip_name} is not a valid ZIP file",
+                            zipfile,
+                            archive_name,
+                            zip_name,
+                            animations,
+                            size_limit,
                         )
-                        # The file will be removed with the temporary directory
-                        continue
-
-                    if team_animation == AnimationHandling.team and animations_found:
-                        insert_match_files(tmpdir / archive_name, tmpdir / 'animations')
+                        if upload is None:
+                            continue
 
-                    # get team's channel
-                    tla, channel = await get_team_channel(ctx, archive_name, zip_name)
-                    if not channel:
-                        continue
-
-                    # upload to team channel with message
-                    if not await send_file(
-                        ctx,
-                        channel,
-                        tmpdir / archive_name,
-                        event_name,
-                        logging_str=f"Uploaded logs for {tla}",
-                    ):
-                        # try again without animations
-                        # TODO test this clause in unit testing
-                        if team_animation:
-                            # extract original archive, modified version is overwritten
-                            zipfile.extract(archive_name, path=tmpdir)
-
-                            if await send_file(  # retry with original archive
-                                ctx,
-                                channel,
-                                tmpdir / archive_name,
-                                event_name,
-                                logging_str=f"Uploaded only logs for {tla}",
-                            ):
-                                await log_and_reply(
-                                    ctx,
-                                    f"Only able to upload logs for {tla}, "
-                                    "no animations were served",
-                                )
-
-                        continue
-
-                    completed_tlas.append(tla)
+                        tla, channel, archive = upload
+                        await upload_limit.acquire()
+                        uploads.append((tla, asyncio.create_task(upload_team_archive(
+                            ctx,
+                            archive,
+                            tla,
+                            channel,
+                            event_name,
+                            journal,
+                            upload_limit,
+                            size_limit,
+                        ))))
+                finally:
+                    # Don't leave uploads running once the temporary directory is removed
+                    results = await asyncio.gather(*(task for _, task in uploads), return_exceptions=True)
+                    if animations is not None:
+                        animations.shared.close()
+
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+
+                completed_tlas = [tla for (tla, _), result in zip(uploads, results) if result]
 
             if team_animation == AnimationHandling.separate and animations_found:
                 common_channel = await get_channel(ctx, "general")
@@ -296,19 +699,103 @@ async def logs_upload(
                     await send_file(
                         ctx,
                         common_channel,
-                        tmpdir / 'animations.zip',
+                        Upload('animations.zip', tmpdir / 'animations.zip'),
                         event_name,
                         msg_str="Here are the animation files",
                         logging_str="Uploaded animations",
                     )
 
-            await ctx.followup.send(
-                content=f"Successfully uploaded logs to {len(completed_tlas)} teams: {', '.join(completed_tlas)}",
-            )
+            journal.finish()
+
+            msg = f"Successfully uploaded logs to {len(completed_tlas)} teams: {', '.join(completed_tlas)}"
+            if skipped_tlas:
+                msg += f"\nSkipped {len(skipped_tlas)} teams which already had these logs: {', '.join(skipped_tlas)}"
+            await ctx.followup.send(content=msg)
     except BadZipFile:
         await log_and_reply(ctx, f"# {zip_name} is not a valid ZIP file")
 
 
+async def download_logs(
+    interaction: discord.interactions.Interaction['BotClient'],
+    url: str,
+    filename: str,
+) -> Path | None:
+    """
+    Download a logs archive into the download cache, unless the cached copy is unchanged.
+
+    Returns the path of the cached archive, or None if the download failed.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, headers=download_cache.request_headers(url)) as resp:
+            if resp.status == 304:
+                logger.info(f"Using the cached copy of {url}")
+                download_cache.touch(url)
+                return download_cache.path(url)
+
+            if resp.status >= 400:
+                logger.error(
+                    f"Download from {url} failed with error "
+                    f"{resp.status}, {resp.reason}",
+                )
+                if resp.status == 416:  # the partial download can't be resumed
+                    download_cache.discard(url)
+                await interaction.followup.send(content="Zip file failed to download")
+                return None
+
+            # the rest of an interrupted download, if the server agreed to resume it
+            offset = 0
+            if resp.status == 206:
+                offset = download_cache.resume_offset(url)
+                range_search = re.match(r'bytes ([0-9]+)-', resp.headers.get('Content-Range', ''))
+                if range_search is None or int(range_search[1]) != offset:
+                    logger.error(f"Download from {url} resumed from the wrong place")
+                    download_cache.discard(url)
+                    await interaction.followup.send(content="Zip file failed to download")
+                    return None
+                logger.info(f"Resuming the download of {url} from {_mib(offset)}")
+
+            total_size = resp.content_length
+            if total_size is not None:
+                total_size += offset
+                if total_size > LOGS_MAX_DOWNLOAD_SIZE:
+                    await log_and_reply(
+                        interaction,
+                        f"# {filename} is too large to download at {_mib(total_size)}, "
+                        f"the limit is {_mib(LOGS_MAX_DOWNLOAD_SIZE)}",
+                    )
+                    return None
+
+            with download_cache.open_download(
+                url,
+                resp.headers.get('ETag'),
+                resp.headers.get('Last-Modified'),
+                resume=offset > 0,
+            ) as f:
+                downloaded = offset
+                last_progress = time.monotonic()
+                async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    downloaded += len(chunk)
+                    if downloaded > LOGS_MAX_DOWNLOAD_SIZE:
+                        f.close()
+                        download_cache.discard(url)
+                        await log_and_reply(
+                            interaction,
+                            f"# {filename} is larger than the download limit of {_mib(LOGS_MAX_DOWNLOAD_SIZE)}",
+                        )
+                        return None
+
+                    f.write(chunk)
+
+                    if time.monotonic() - last_progress >= DOWNLOAD_PROGRESS_INTERVAL:
+                        last_progress = time.monotonic()
+                        await interaction.edit_original_response(
+                            content=_download_status_msg(downloaded, total_size),
+                        )
+
+    download_cache.finish(url)
+    return download_cache.path(url)
+
+
 @app_commands.command(  # type:ignore[arg-type]
     name="logs",
     description="Get combined logs archive from URL for distribution to teams, avoids Discord's size limit",
@@ -317,45 +804,36 @@ async def logs_upload(
     url="URL to a zip of logs",
     animations="How the animation files will be handled",
     event_name="Optionally set the event name used in the bot's message to teams",
+    restart="Send the logs to every team, even those which were sent them by an earlier run",
 )
 async def logs(
     interaction: discord.interactions.Interaction['BotClient'],
     url: str,
     animations: AnimationHandling = AnimationHandling.none,
     event_name: str | None = None,
+    restart: bool = False,
 ) -> None:
     logger.info(f"{interaction.user.name} started downloading logs from {url}")
 
-    with tempfile.TemporaryFile(suffix='.zip') as zipfile:
-        if url.endswith('.zip'):
-            filename = url.split("/")[-1]
-        else:
-            filename = f"logs_upload-{date.today()}.zip"
-
-        await interaction.response.defer(thinking=True)  # provides feedback that the bot is processing
-        # download zip, using aiohttp
-        async with aiohttp.ClientSession() as session:
-            resp = await session.get(url)
-
-            if resp.status >= 400:
-                logger.error(
-                    f"Download from {url} failed with error "
-                    f"{resp.status}, {resp.reason}",
-                )
-                await interaction.followup.send(content="Zip file failed to download")
-                return
-
-            zipfile_data = await resp.read()
-
-            zipfile.write(zipfile_data)
-
-        # start processing from beginning of the file
-        zipfile.seek(0)
-
-        await logs_upload(
-            interaction,
-            zipfile,
-            filename,
-            event_name or "",
-            animations,
-        )
+    if url.endswith('.zip'):
+        filename = url.split("/")[-1]
+    else:
+        filename = f"logs_upload-{date.today()}.zip"
+
+    await interaction.response.defer(thinking=True)  # provides feedback that the bot is processing
+    # held until the upload is done so the cached file isn't replaced or removed while it's read
+    async with download_cache.lock(url):
+        path = await download_logs(interaction, url, filename)
+        if path is None:
+            return
+
+        with open(path, 'rb') as zipfile:
+            await logs_upload(
+                interaction,
+                zipfile,
+                filename,
+                event_name or "",
+                animations,
+                UploadJournal(interaction.client.state, url, event_name or ""),
+                restart,
+            )
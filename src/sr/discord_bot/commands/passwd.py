@@ -34,7 +34,9 @@ async def passwd(
                 )
                 return
             interaction.client.set_password(tla, new_password)
-            await interaction.response.send_message(f"The password for {tla.upper()} has been changed.", ephemeral=True)
+            message = f"The password for {tla.upper()} has been changed."
+            message += interaction.client.shared_password_warning([tla])
+            await interaction.response.send_message(message, ephemeral=True)
         else:
             password = interaction.client.passwords[tla]
             await interaction.response.send_message(f"The password for {tla.upper()} is `{password}`", ephemeral=True)
@@ -1,5 +1,3 @@
-# file to store messages being dynamically updated between reboots
-import json
 from typing import Any, Dict, NamedTuple, TYPE_CHECKING
 
 import discord
@@ -10,8 +8,6 @@ from sr.discord_bot.constants import VOLUNTEER_ROLE
 if TYPE_CHECKING:
     from sr.discord_bot.bot import BotClient
 
-SUBSCRIBE_MSG_FILE = 'subscribed_messages.json'
-
 
 class SubscribedMessage(NamedTuple):
     """A message that is updated when the server statistics change."""
@@ -116,10 +112,5 @@ async def send_response(
 
 
 def load_subscribed_messages(client: 'BotClient') -> None:
-    """Load subscribed message details from file."""
-    try:
-        with open(SUBSCRIBE_MSG_FILE) as f:
-            client.subscribed_messages = json.load(f, object_hook=SubscribedMessage.load)
-    except (json.JSONDecodeError, FileNotFoundError):
-        with open(SUBSCRIBE_MSG_FILE, 'w') as f:
-            f.write('[]')
+    """Load subscribed message details from the bot's state."""
+    client.subscribed_messages = [SubscribedMessage.load(dct) for dct in client.state.subscribed_messages()]
@@ -1,8 +1,26 @@
-from typing import Mapping, TYPE_CHECKING
+import io
+import time
+import asyncio
+from typing import (
+    List,
+    Tuple,
+    Counter,
+    Mapping,
+    Callable,
+    NamedTuple,
+    TYPE_CHECKING,
+)
 
 import discord
 from discord import app_commands
 
+from sr.discord_bot.manifest import (
+    TeamSpec,
+    ManifestError,
+    ManifestFormat,
+    parse_manifest,
+    write_manifest,
+)
 from sr.discord_bot.commands.ui import TeamDeleteConfirm
 
 if TYPE_CHECKING:
@@ -13,7 +31,11 @@ from sr.discord_bot.constants import (
     TEAM_LEADER_ROLE,
     TEAM_CATEGORY_NAME,
     TEAM_CHANNEL_PREFIX,
+    DELETE_TEAM_CONCURRENCY,
+    IMPORT_TEAMS_CONCURRENCY,
+    PROGRESS_UPDATE_INTERVAL,
     TEAM_VOICE_CATEGORY_NAME,
+    REPAIR_PERMISSIONS_CONCURRENCY,
 )
 
 TEAM_CREATED_REASON = "Created via command by "
@@ -29,6 +51,26 @@ class Team(app_commands.Group):
 group = Team()
 
 
+class ProgressReporter:
+    """Shows how many items a long running command has processed in its response, without editing it too often."""
+
+    def __init__(
+        self,
+        interaction: discord.interactions.Interaction["BotClient"],
+        message: Callable[[int], str],
+    ) -> None:
+        self.interaction = interaction
+        self.message = message
+        self.processed = 0
+        self._last_update = time.monotonic()
+
+    async def item_done(self) -> None:
+        self.processed += 1
+        if time.monotonic() - self._last_update >= PROGRESS_UPDATE_INTERVAL:
+            self._last_update = time.monotonic()
+            await self.interaction.edit_original_response(content=self.message(self.processed))
+
+
 def permissions(client: "BotClient", team: discord.Role) -> Mapping[
     discord.Role | discord.Member, discord.PermissionOverwrite,
 ]:
@@ -66,10 +108,10 @@ async def new_team(interaction: discord.interactions.Interaction["BotClient"], t
     if guild is None:
         raise app_commands.NoPrivateMessage()
 
-    category = discord.utils.get(guild.categories, name=TEAM_CATEGORY_NAME)
+    category = interaction.client.guild_index.category(TEAM_CATEGORY_NAME)
     role_name = f"{ROLE_PREFIX}{tla.upper()}"
 
-    if discord.utils.get(guild.roles, name=role_name) is not None:
+    if interaction.client.guild_index.role(role_name) is not None:
         await interaction.response.send_message(f"{role_name} already exists", ephemeral=True)
         return
 
@@ -86,7 +128,29 @@ async def new_team(interaction: discord.interactions.Interaction["BotClient"], t
         overwrites=permissions(interaction.client, role),
     )
     interaction.client.set_password(tla, password)
-    await interaction.response.send_message(f"{role.mention} and {channel.mention} created!", ephemeral=True)
+    message = f"{role.mention} and {channel.mention} created!"
+    message += interaction.client.shared_password_warning([tla])
+    await interaction.response.send_message(message, ephemeral=True)
+
+
+async def _remove_team_member(
+    client: "BotClient",
+    member: discord.Member,
+    guild_name: str,
+    reason: str,
+) -> bool:
+    """Tell a member their team has been removed and kick them, returning whether they were kicked."""
+    try:
+        await member.send(f"Your {guild_name} team has been removed.")
+    except discord.HTTPException as e:  # members can turn off messages from the server
+        client.logger.info(f"Unable to message '{member.name}' about their team's removal: {e}")
+
+    try:
+        await member.kick(reason=reason)
+    except discord.HTTPException as e:
+        client.logger.error(f"Unable to kick '{member.name}': {e}")
+        return False
+    return True
 
 
 @group.command(  # type:ignore[arg-type]
@@ -100,7 +164,7 @@ async def delete_team(interaction: discord.interactions.Interaction["BotClient"]
     guild: discord.Guild | None = interaction.guild
     if guild is None:
         raise app_commands.NoPrivateMessage()
-    role: discord.Role | None = discord.utils.get(guild.roles, name=f"{ROLE_PREFIX}{tla.upper()}")
+    role = interaction.client.guild_index.role(f"{ROLE_PREFIX}{tla.upper()}")
 
     if role is None:
         await interaction.response.send_message(f"Team {tla.upper()} does not exist", ephemeral=True)
@@ -115,13 +179,24 @@ async def delete_team(interaction: discord.interactions.Interaction["BotClient"]
         await interaction.edit_original_response(content=f"_Deleting Team {tla.upper()}..._", view=None)
         reason = f"Team removed by {interaction.user.name}"
         if role is not None:
-            for member in role.members:
-                await member.send(f"Your {guild.name} team has been removed.")
-                await member.kick(reason=reason)
+            members = role.members
+            limit = asyncio.Semaphore(DELETE_TEAM_CONCURRENCY)
+            progress = ProgressReporter(
+                interaction,
+                lambda processed: f"_Deleting Team {tla.upper()}... {processed}/{len(members)} members removed_",
+            )
+
+            async def remove(member: discord.Member) -> bool:
+                async with limit:
+                    kicked = await _remove_team_member(interaction.client, member, guild.name, reason)
+                await progress.item_done()
+                return kicked
 
-            for channel in guild.channels:
-                if channel.name.startswith(f"{TEAM_CHANNEL_PREFIX}{tla.lower()}"):
-                    await channel.delete(reason=reason)
+            results = await asyncio.gather(*(remove(member) for member in members))
+            not_kicked = [member for member, kicked in zip(members, results) if not kicked]
+
+            for channel in interaction.client.guild_index.team_channels(tla):
+                await channel.delete(reason=reason)
 
             await role.delete(reason=reason)
             interaction.client.remove_password(tla)
@@ -130,7 +205,10 @@ async def delete_team(interaction: discord.interactions.Interaction["BotClient"]
                 isinstance(interaction.channel, discord.abc.GuildChannel)
                 and not interaction.channel.name.startswith(f"{TEAM_CHANNEL_PREFIX}{tla.lower()}")
             ):
-                await interaction.edit_original_response(content=f"Team {tla.upper()} has been deleted")
+                message = f"Team {tla.upper()} has been deleted"
+                if not_kicked:
+                    message += f"\nUnable to kick {', '.join(member.mention for member in not_kicked)}"
+                await interaction.edit_original_response(content=message)
     else:
         await interaction.delete_original_response()
 
@@ -147,12 +225,12 @@ async def create_voice(interaction: discord.interactions.Interaction["BotClient"
     if guild is None:
         raise app_commands.NoPrivateMessage()
 
-    role: discord.Role | None = discord.utils.get(guild.roles, name=f"{ROLE_PREFIX}{tla.upper()}")
+    role = interaction.client.guild_index.role(f"{ROLE_PREFIX}{tla.upper()}")
     if role is None:
         await interaction.response.send_message(f"Team {tla.upper()} does not exist", ephemeral=True)
         return
 
-    category = discord.utils.get(guild.categories, name=TEAM_VOICE_CATEGORY_NAME)
+    category = interaction.client.guild_index.category(TEAM_VOICE_CATEGORY_NAME)
     channel = await guild.create_voice_channel(
         f"{TEAM_CHANNEL_PREFIX}{tla.lower()}",
         category=category,
@@ -178,13 +256,13 @@ async def create_team_channel(
     if guild is None:
         raise app_commands.NoPrivateMessage()
 
-    role: discord.Role | None = discord.utils.get(guild.roles, name=f"{ROLE_PREFIX}{tla.upper()}")
+    role = interaction.client.guild_index.role(f"{ROLE_PREFIX}{tla.upper()}")
     if role is None:
         await interaction.response.send_message("Team does not exist", ephemeral=True)
         return
 
-    main_channel = discord.utils.get(guild.text_channels, name=f"{TEAM_CHANNEL_PREFIX}{tla.lower()}")
-    category = discord.utils.get(guild.categories, name=TEAM_CATEGORY_NAME)
+    main_channel = interaction.client.guild_index.text_channel(f"{TEAM_CHANNEL_PREFIX}{tla.lower()}")
+    category = interaction.client.guild_index.category(TEAM_CATEGORY_NAME)
 
     if category is None or main_channel is None:
         await interaction.response.send_message(f"Team {tla.upper()} does not exist", ephemeral=True)
@@ -200,31 +278,25 @@ async def create_team_channel(
     await interaction.response.send_message(f"{new_channel.mention} created!", ephemeral=True)
 
 
-async def _export_team(
-    team_tla: str,
-    only_teams: bool,
-    guild: discord.Guild,
-    interaction: discord.interactions.Interaction["BotClient"],
-) -> str:
-    main_channel = discord.utils.get(guild.text_channels, name=f"team-{team_tla.lower()}")
-    if main_channel is None and not isinstance(main_channel, discord.abc.GuildChannel):
-        raise app_commands.AppCommandError("Invalid TLA")
-
-    password = interaction.client.passwords[team_tla]
-    commands = [f"/team new tla:{team_tla} name:{main_channel.topic} password:{password}"]
+def _team_spec(client: "BotClient", tla: str) -> TeamSpec | None:
+    """The details needed to recreate a team, or None if it has no main channel."""
+    main_channel_name = f"{TEAM_CHANNEL_PREFIX}{tla.lower()}"
+    main_channel = None
+    channels = []
+    voice = False
+    for channel in client.guild_index.team_channels(tla):
+        if isinstance(channel, discord.VoiceChannel):
+            voice = voice or channel.name == main_channel_name
+        elif not isinstance(channel, discord.TextChannel):
+            continue
+        elif channel.name == main_channel_name:
+            main_channel = channel
+        else:
+            channels.append(channel.name.removeprefix(f"{main_channel_name}-"))
 
-    if not only_teams:
-        channels = filter(lambda c: c.name.startswith(f"team-{team_tla.lower()}-"), guild.text_channels)
-        for channel in channels:
-            suffix = channel.name.removeprefix(f"team-{team_tla.lower()}-")
-            commands.append(f"/team channel tla:{team_tla} suffix:{suffix}")
-
-        has_voice: bool = discord.utils.get(guild.voice_channels, name=f"team-{team_tla.lower()}") is not None
-        if has_voice:
-            commands.append(f"/team voice tla:{team_tla}")
-
-        return "\n".join(commands) + "\n"
-    return ""
+    if main_channel is None:
+        return None
+    return TeamSpec(tla, main_channel.topic or '', client.passwords.get(tla, ''), tuple(channels), voice)
 
 
 @group.command(  # type:ignore[arg-type]
@@ -234,11 +306,13 @@ async def _export_team(
 @app_commands.describe(
     tla='Three Letter Acronym (e.g. SRZ)',
     only_teams="Only creates teams without extra channels",
+    file_format="Output the commands, or a CSV or JSON manifest for /team import",
 )
 async def export_team(
     interaction: discord.interactions.Interaction["BotClient"],
     tla: str | None = None,
     only_teams: bool = False,
+    file_format: ManifestFormat = ManifestFormat.commands,
 ) -> None:
     guild: discord.Guild | None = interaction.guild
     if guild is None:
@@ -246,22 +320,256 @@ async def export_team(
 
     await interaction.response.defer(thinking=True, ephemeral=True)
 
-    output = "```\n"
-
     if tla is None:
-        for team_role in guild.roles:
-            if team_role.name.startswith(ROLE_PREFIX) and team_role.name != TEAM_LEADER_ROLE:
-                output += await _export_team(team_role.name.removeprefix(ROLE_PREFIX), only_teams, guild, interaction)
+        tlas = [
+            team_role.name.removeprefix(ROLE_PREFIX)
+            for team_role in guild.roles
+            if team_role.name.startswith(ROLE_PREFIX) and team_role.name != TEAM_LEADER_ROLE
+        ]
+    else:
+        tlas = [tla.upper()]
+
+    teams = []
+    for team_tla in tlas:
+        team = _team_spec(interaction.client, team_tla)
+        if team is None:
+            if tla is not None:
+                raise app_commands.AppCommandError("Invalid TLA")
+            continue
+        teams.append(team._replace(channels=(), voice=False) if only_teams else team)
+
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+    write_manifest(teams, text, file_format)
+    text.detach()  # leave the buffer open to be sent
+    buffer.seek(0)
+
+    await interaction.followup.send(
+        content=f"Exported {len(teams)} teams",
+        file=discord.File(buffer, filename=f"teams.{file_format.value}"),
+        ephemeral=True,
+    )
+
+
+class TeamImport(NamedTuple):
+    """The parts of a team listed in a manifest which don't exist yet."""
+
+    team: TeamSpec
+    role: bool
+    main_channel: bool
+    # suffixes of the secondary channels to create
+    channels: Tuple[str, ...]
+    voice: bool
+    password: bool
+
+    def is_needed(self) -> bool:
+        return any((self.role, self.main_channel, self.channels, self.voice, self.password))
+
+    def __str__(self) -> str:
+        tla = self.team.tla
+        parts = []
+        if self.role:
+            parts.append(f"role {ROLE_PREFIX}{tla}")
+        if self.main_channel:
+            parts.append(f"#{TEAM_CHANNEL_PREFIX}{tla.lower()}")
+        parts.extend(f"#{TEAM_CHANNEL_PREFIX}{tla.lower()}-{suffix}" for suffix in self.channels)
+        if self.voice:
+            parts.append("voice channel")
+        if self.password:
+            parts.append("password")
+        return f"{tla}: {', '.join(parts)}"
+
+
+def _plan_team_import(client: "BotClient", team: TeamSpec) -> TeamImport:
+    index = client.guild_index
+    main_channel_name = f"{TEAM_CHANNEL_PREFIX}{team.tla.lower()}"
+    return TeamImport(
+        team,
+        role=index.role(f"{ROLE_PREFIX}{team.tla}") is None,
+        main_channel=index.text_channel(main_channel_name) is None,
+        channels=tuple(
+            suffix for suffix in team.channels
+            if index.text_channel(f"{main_channel_name}-{suffix}") is None
+        ),
+        voice=team.voice and index.voice_channel(main_channel_name) is None,
+        # teams exported without a password are listed with an empty one
+        password=bool(team.password) and team.tla not in client.passwords,
+    )
+
+
+async def _import_team(
+    client: "BotClient",
+    guild: discord.Guild,
+    plan: TeamImport,
+    reason: str,
+) -> Counter[str]:
+    """Create the missing parts of a team, returning the number of each thing created."""
+    team = plan.team
+    created: Counter[str] = Counter()
+    main_channel_name = f"{TEAM_CHANNEL_PREFIX}{team.tla.lower()}"
+
+    role = client.guild_index.role(f"{ROLE_PREFIX}{team.tla}")
+    if role is None:
+        role = await guild.create_role(reason=reason, name=f"{ROLE_PREFIX}{team.tla}", mentionable=True)
+        created['roles'] += 1
+
+    category = client.guild_index.category(TEAM_CATEGORY_NAME)
+    main_channel = client.guild_index.text_channel(main_channel_name)
+    if main_channel is None:
+        main_channel = await guild.create_text_channel(
+            reason=reason,
+            name=main_channel_name,
+            topic=team.name,
+            category=category,
+            overwrites=permissions(client, role),
+        )
+        created['channels'] += 1
+
+    for suffix in plan.channels:
+        await guild.create_text_channel(
+            name=f"{main_channel_name}-{suffix}",
+            category=category,
+            overwrites=permissions(client, role),
+            position=main_channel.position + 1,
+            reason=reason,
+        )
+        created['channels'] += 1
+
+    if plan.voice:
+        await guild.create_voice_channel(
+            main_channel_name,
+            category=client.guild_index.category(TEAM_VOICE_CATEGORY_NAME),
+            overwrites=permissions(client, role),
+            reason=reason,
+        )
+        created['voice channels'] += 1
+    return created
+
+
+async def _send_lines(
+    interaction: discord.interactions.Interaction["BotClient"],
+    message: str,
+    lines: List[str],
+    filename: str,
+) -> None:
+    """Send a message followed by a list, attaching the list as a file if it's too long for a message."""
+    content = f"{message}\n```\n" + "\n".join(lines) + "\n```" if lines else message
+    if len(content) <= 2000:
+        await interaction.followup.send(content=content, ephemeral=True)
     else:
-        output = output + await _export_team(tla, only_teams, guild, interaction)
-    output = output + "\n```"
-    await interaction.followup.send(content=output, ephemeral=True)
+        file = discord.File(io.BytesIO("\n".join(lines).encode()), filename=filename)
+        await interaction.followup.send(content=message, file=file, ephemeral=True)
+
+
+@group.command(  # type:ignore[arg-type]
+    name='import',
+    description='Creates teams from a file of /team export commands, or a CSV or JSON manifest',
+)
+@app_commands.describe(
+    manifest='Teams to create, as output by /team export or as a .csv or .json file',
+    dry_run="Only list what would be created",
+)
+async def import_teams(
+    interaction: discord.interactions.Interaction["BotClient"],
+    manifest: discord.Attachment,
+    dry_run: bool = False,
+) -> None:
+    guild: discord.Guild | None = interaction.guild
+    if guild is None:
+        raise app_commands.NoPrivateMessage()
+
+    await interaction.response.defer(thinking=True, ephemeral=True)
+
+    try:
+        teams = parse_manifest(manifest.filename, (await manifest.read()).decode('utf-8-sig'))
+    except (ManifestError, UnicodeDecodeError) as e:
+        await interaction.followup.send(content=f"Unable to read {manifest.filename}: {e}", ephemeral=True)
+        return
+
+    plans = [plan for plan in (_plan_team_import(interaction.client, team) for team in teams) if plan.is_needed()]
+    existing = len(teams) - len(plans)
+
+    if dry_run:
+        await _send_lines(
+            interaction,
+            f"Would import {len(plans)} teams, {existing} teams already exist",
+            [str(plan) for plan in plans],
+            'import-plan.txt',
+        )
+        return
+
+    reason = TEAM_CREATED_REASON + interaction.user.name
+    limit = asyncio.Semaphore(IMPORT_TEAMS_CONCURRENCY)
+    progress = ProgressReporter(interaction, lambda processed: f"Importing teams... {processed}/{len(plans)}")
+
+    async def create(plan: TeamImport) -> Counter[str]:
+        async with limit:
+            # discord.py waits out rate limits, this bounds how many requests queue up for them
+            try:
+                created = await _import_team(interaction.client, guild, plan, reason)
+            except discord.HTTPException as e:
+                interaction.client.logger.error(f"Failed to import team {plan.team.tla}: {e}")
+                raise
+        await progress.item_done()
+        return created
+
+    results = await asyncio.gather(*(create(plan) for plan in plans), return_exceptions=True)
+
+    created: Counter[str] = Counter()
+    failed = []
+    for plan, result in zip(plans, results):
+        if isinstance(result, discord.HTTPException):
+            failed.append(f"{plan.team.tla}: {result}")
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            created += result
+
+    # saved together rather than once per team
+    imported_tlas = {plan.team.tla for plan, result in zip(plans, results) if not isinstance(result, BaseException)}
+    interaction.client.set_passwords({
+        plan.team.tla: plan.team.password
+        for plan in plans
+        if plan.password and plan.team.tla in imported_tlas
+    })
+
+    message = (
+        f"Imported {len(imported_tlas)} teams, creating {created['roles']} roles, {created['channels']} channels "
+        f"and {created['voice channels']} voice channels. {existing} teams already existed."
+    )
+    message += interaction.client.shared_password_warning(sorted(imported_tlas))
+    if failed:
+        message += f"\nFailed to import {len(failed)} teams:"
+    await _send_lines(interaction, message, failed, 'import-errors.txt')
 
 
 def _repair_permissions_status_msg(cur_team: int, num_teams: int) -> str:
     return f"Repairing permissions... {cur_team}/{num_teams} teams processed"
 
 
+async def _repair_team_permissions(client: "BotClient", role: discord.Role) -> int:
+    """Update a team's channels and role where they differ, returning the number of channels changed."""
+    tla = role.name.removeprefix(ROLE_PREFIX)
+    channel_permissions = permissions(client, role)
+    repaired = 0
+
+    for channel in client.guild_index.team_channels(tla):
+        if not isinstance(channel, (discord.TextChannel, discord.VoiceChannel)):
+            continue
+        overwrites = channel.overwrites
+        if all(overwrites.get(target) == overwrite for target, overwrite in channel_permissions.items()):
+            continue
+        # overwrites for anything else are kept, as set_permissions would
+        for target, overwrite in channel_permissions.items():
+            overwrites[target] = overwrite
+        await channel.edit(overwrites=overwrites)
+        repaired += 1
+
+    if not role.mentionable:
+        await role.edit(mentionable=True)
+    return repaired
+
+
 @group.command(  # type:ignore[arg-type]
     name='repair-permissions',
     description='Reset channel and team permissions',
@@ -271,7 +579,11 @@ async def repair_permissions(interaction: discord.interactions.Interaction["BotC
     if guild is None:
         raise app_commands.NoPrivateMessage()
 
-    team_roles = [role for role in guild.roles if role.name.startswith(ROLE_PREFIX)]
+    team_roles = [
+        role
+        for role in guild.roles
+        if role.name.startswith(ROLE_PREFIX) and role.name != TEAM_LEADER_ROLE
+    ]
 
     await interaction.response.defer(
         thinking=True,
@@ -279,18 +591,28 @@ async def repair_permissions(interaction: discord.interactions.Interaction["BotC
     )
     await interaction.edit_original_response(content=_repair_permissions_status_msg(0, len(team_roles)))
 
-    for index, role in enumerate(team_roles):
-        tla = role.name.removeprefix(ROLE_PREFIX)
-        channels = [
-            channel
-            for channel in guild.channels
-            if channel.name.startswith(TEAM_CHANNEL_PREFIX + tla)
-        ]
-        channel_permissions = permissions(interaction.client, role)
-        for channel in channels:
-            for channel_role, overwrites in channel_permissions.items():
-                await channel.set_permissions(target=channel_role, overwrite=overwrites)
-        await role.edit(mentionable=True)
-        await interaction.edit_original_response(content=_repair_permissions_status_msg(index + 1, len(team_roles)))
+    limit = asyncio.Semaphore(REPAIR_PERMISSIONS_CONCURRENCY)
+    progress = ProgressReporter(
+        interaction,
+        lambda processed: _repair_permissions_status_msg(processed, len(team_roles)),
+    )
 
-    await interaction.edit_original_response(content="Repairing permissions... done!")
+    async def repair(role: discord.Role) -> int | None:
+        """Repair a team, returning the number of channels changed or None if it failed."""
+        try:
+            async with limit:
+                repaired: int | None = await _repair_team_permissions(interaction.client, role)
+        except discord.HTTPException as e:
+            interaction.client.logger.error(f"Failed to repair the permissions of {role.name}: {e}")
+            repaired = None
+        await progress.item_done()
+        return repaired
+
+    results = await asyncio.gather(*(repair(role) for role in team_roles))
+    repaired = sum(result for result in results if result is not None)
+    failed = [role.name.removeprefix(ROLE_PREFIX) for role, result in zip(team_roles, results) if result is None]
+
+    message = f"Repairing permissions... done! {repaired} channels updated"
+    if failed:
+        message += f"\nFailed to repair {', '.join(failed)}"
+    await interaction.edit_original_response(content=message)
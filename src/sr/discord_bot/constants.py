@@ -1,3 +1,11 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Some settings below can be overridden by environment variables, which may be set in .env
+load_dotenv()
+
 # name of the category for new welcome channels to go.
 WELCOME_CATEGORY_NAME = "Welcome"
 
@@ -27,4 +35,44 @@ TEAM_LEADER_ROLE = "Team Supervisor"
 
 FEED_URL = "https://studentrobotics.org/feed.xml"
 FEED_CHANNEL_NAME = "blog"
+# Feeds to follow, mapping the feed's name to its URL and the name of the channel to post to
+FEEDS = {
+    "blog": (FEED_URL, FEED_CHANNEL_NAME),
+}
 FEED_CHECK_INTERVAL = 60 * 3  # in seconds
+FEED_MAX_CHECK_INTERVAL = 60 * 30  # in seconds
+# Factors to lengthen a feed's check interval by after finding no new posts or failing
+FEED_QUIET_BACKOFF = 1.25
+FEED_ERROR_BACKOFF = 2
+# Number of sent post IDs to remember
+SEEN_POSTS_LIMIT = 500
+# Number of posts to send from a feed none of whose posts have been sent yet
+FEED_INITIAL_POSTS = 1
+
+# How long to collect membership changes for before updating subscribed messages
+STATS_REFRESH_INTERVAL = 10  # in seconds
+# Maximum number of subscribed messages to edit at once
+SUBSCRIBED_EDIT_CONCURRENCY = 5
+
+# Maximum number of teams to repair the permissions of at once
+REPAIR_PERMISSIONS_CONCURRENCY = 5
+# Maximum number of members to message and kick at once when deleting a team
+DELETE_TEAM_CONCURRENCY = 5
+# Maximum number of teams to create at once when importing teams
+IMPORT_TEAMS_CONCURRENCY = 5
+# Minimum time between progress updates for long running commands
+PROGRESS_UPDATE_INTERVAL = 2  # in seconds
+
+# How long to collect changes to the bot's state for before saving them
+STATE_FLUSH_DELAY = 1  # in seconds
+# How long to wait before trying to save changes again after failing to
+STATE_RETRY_DELAY = 10  # in seconds
+
+# Largest logs archive which /logs will download, in bytes
+LOGS_MAX_DOWNLOAD_SIZE = int(os.getenv('LOGS_MAX_DOWNLOAD_SIZE', 4 * 1024 ** 3))
+# Downloaded logs archives are kept here, so running /logs again doesn't download them again
+LOGS_CACHE_DIR = Path(os.getenv('LOGS_CACHE_DIR', 'logs_cache'))
+# Size of the download cache, in bytes, beyond which the least recently used archives are removed
+LOGS_CACHE_SIZE = int(os.getenv('LOGS_CACHE_SIZE', 1024 ** 3))
+# Number of team archives to upload at once
+LOGS_UPLOAD_CONCURRENCY = 4
@@ -0,0 +1,128 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from typing import IO, Dict, NamedTuple
+from pathlib import Path
+
+
+class CacheEntry(NamedTuple):
+    """The validators of a cached download and whether it finished."""
+
+    url: str
+    etag: str | None
+    modified: str | None
+    complete: bool
+
+
+class DownloadCache:
+    """
+    Downloaded files kept on disk, so downloading them again only checks they are unchanged.
+
+    Each file is kept under a hash of its URL, alongside the ETag and
+    Last-Modified validators it was downloaded with. Interrupted downloads are
+    resumed with a range request. Once the cache is larger than its size limit
+    the least recently used files are removed.
+    """
+
+    def __init__(self, logger: logging.Logger, directory: Path, size_limit: int) -> None:
+        self.logger = logger
+        self.directory = directory
+        self.size_limit = size_limit
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def path(self, url: str) -> Path:
+        return self.directory / f"{self._key(url)}.data"
+
+    def lock(self, url: str) -> asyncio.Lock:
+        """A lock to hold while downloading or reading a URL's file."""
+        return self._locks.setdefault(self._key(url), asyncio.Lock())
+
+    def entry(self, url: str) -> CacheEntry | None:
+        if not self.path(url).exists():
+            return None
+        try:
+            with open(self._meta_path(url)) as f:
+                meta = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return None
+        if meta.get('url') != url:
+            return None
+        return CacheEntry(url, meta.get('etag'), meta.get('modified'), bool(meta.get('complete')))
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """Headers to revalidate the cached file, or to fetch the rest of a partial download."""
+        entry = self.entry(url)
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry.complete:
+            if entry.etag is not None:
+                headers['If-None-Match'] = entry.etag
+            if entry.modified is not None:
+                headers['If-Modified-Since'] = entry.modified
+        elif validator := entry.etag or entry.modified:
+            # only resume if the file hasn't changed since the download started
+            headers['Range'] = f"bytes={self.resume_offset(url)}-"
+            headers['If-Range'] = validator
+        return headers
+
+    def resume_offset(self, url: str) -> int:
+        """The size of the partial download to resume from."""
+        try:
+            return self.path(url).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def open_download(self, url: str, etag: str | None, modified: str | None, resume: bool = False) -> IO[bytes]:
+        """Open the URL's file to write a new download to, or to append the rest of a partial one."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._write_meta(CacheEntry(url, etag, modified, complete=False))
+        return open(self.path(url), 'ab' if resume else 'wb')
+
+    def finish(self, url: str) -> None:
+        """Mark the URL's download as complete and remove older files beyond the size limit."""
+        entry = self.entry(url)
+        if entry is not None:
+            self._write_meta(entry._replace(complete=True))
+        self.evict()
+
+    def touch(self, url: str) -> None:
+        """Mark the URL's file as recently used."""
+        self.path(url).touch()
+
+    def discard(self, url: str) -> None:
+        for path in (self.path(url), self._meta_path(url)):
+            path.unlink(missing_ok=True)
+
+    def evict(self) -> None:
+        """Remove the least recently used files until the cache fits in its size limit."""
+        files = sorted(self.directory.glob('*.data'), key=lambda path: path.stat().st_mtime)
+        total_size = sum(path.stat().st_size for path in files)
+
+        for path in files:
+            if total_size <= self.size_limit:
+                break
+            lock = self._locks.get(path.stem)
+            if lock is not None and lock.locked():  # still in use
+                continue
+
+            total_size -= path.stat().st_size
+            path.unlink()
+            path.with_suffix('.json').unlink(missing_ok=True)
+            self.logger.info(f"Removed {path.name} from the download cache")
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _meta_path(self, url: str) -> Path:
+        return self.directory / f"{self._key(url)}.json"
+
+    def _write_meta(self, entry: CacheEntry) -> None:
+        # written to a new file first so a crash never leaves it half-written
+        tmp_path = self._meta_path(entry.url).with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(entry._asdict(), f)
+        os.replace(tmp_path, self._meta_path(entry.url))
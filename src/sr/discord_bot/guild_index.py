@@ -0,0 +1,101 @@
+from typing import Dict, List, Type, TypeVar
+from collections import defaultdict
+
+import discord
+
+from sr.discord_bot.constants import TEAM_CHANNEL_PREFIX
+
+T = TypeVar('T')
+ChannelT = TypeVar('ChannelT', bound=discord.abc.GuildChannel)
+
+
+def channel_tla(channel_name: str) -> str | None:
+    """The TLA of the team a channel belongs to, in lower case, if it's a team channel."""
+    if not channel_name.startswith(TEAM_CHANNEL_PREFIX):
+        return None
+    # secondary channels are named team-<tla>-<suffix>
+    return channel_name.removeprefix(TEAM_CHANNEL_PREFIX).split('-')[0] or None
+
+
+class GuildIndex:
+    """
+    The guild's roles, channels and categories by name, and team channels by TLA.
+
+    Built when the bot connects and kept up to date from the gateway's role and
+    channel events, so lookups don't need to scan the whole guild. Names aren't
+    unique, so each name maps to every object with it by ID.
+    """
+
+    def __init__(self) -> None:
+        self._roles: Dict[str, Dict[int, discord.Role]] = defaultdict(dict)
+        self._channels: Dict[str, Dict[int, discord.abc.GuildChannel]] = defaultdict(dict)
+        self._team_channels: Dict[str, Dict[int, discord.abc.GuildChannel]] = defaultdict(dict)
+
+    def rebuild(self, guild: discord.Guild) -> None:
+        self._roles.clear()
+        self._channels.clear()
+        self._team_channels.clear()
+        for role in guild.roles:
+            self.add_role(role)
+        for channel in guild.channels:
+            self.add_channel(channel)
+
+    def add_role(self, role: discord.Role) -> None:
+        self._roles[role.name][role.id] = role
+
+    def remove_role(self, role: discord.Role) -> None:
+        _discard(self._roles, role.name, role.id)
+
+    def update_role(self, before: discord.Role, after: discord.Role) -> None:
+        self.remove_role(before)
+        self.add_role(after)
+
+    def add_channel(self, channel: discord.abc.GuildChannel) -> None:
+        self._channels[channel.name][channel.id] = channel
+        if tla := channel_tla(channel.name):
+            self._team_channels[tla][channel.id] = channel
+
+    def remove_channel(self, channel: discord.abc.GuildChannel) -> None:
+        _discard(self._channels, channel.name, channel.id)
+        if tla := channel_tla(channel.name):
+            _discard(self._team_channels, tla, channel.id)
+
+    def update_channel(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel) -> None:
+        self.remove_channel(before)
+        self.add_channel(after)
+
+    def role(self, name: str) -> discord.Role | None:
+        return next(iter(self._roles.get(name, {}).values()), None)
+
+    def channel(self, name: str) -> discord.abc.GuildChannel | None:
+        """A channel of any type with the given name."""
+        return next(iter(self._channels.get(name, {}).values()), None)
+
+    def text_channel(self, name: str) -> discord.TextChannel | None:
+        return self._channel_of_type(name, discord.TextChannel)
+
+    def voice_channel(self, name: str) -> discord.VoiceChannel | None:
+        return self._channel_of_type(name, discord.VoiceChannel)
+
+    def category(self, name: str) -> discord.CategoryChannel | None:
+        return self._channel_of_type(name, discord.CategoryChannel)
+
+    def team_channels(self, tla: str) -> List[discord.abc.GuildChannel]:
+        """The main, secondary and voice channels of a team, in the order they appear in the guild."""
+        channels = self._team_channels.get(tla.lower(), {}).values()
+        return sorted(channels, key=lambda channel: channel.position)
+
+    def _channel_of_type(self, name: str, channel_type: Type[ChannelT]) -> ChannelT | None:
+        for channel in self._channels.get(name, {}).values():
+            if isinstance(channel, channel_type):
+                return channel
+        return None
+
+
+def _discard(index: Dict[str, Dict[int, T]], name: str, object_id: int) -> None:
+    objects = index.get(name)
+    if objects is None or object_id not in objects:
+        return
+    del objects[object_id]
+    if not objects:
+        del index[name]
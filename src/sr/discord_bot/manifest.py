@@ -0,0 +1,167 @@
+import io
+import re
+import csv
+import json
+from enum import Enum
+from typing import IO, Dict, List, Tuple, Iterable, NamedTuple
+
+# Columns of a CSV manifest, secondary channel suffixes are separated by spaces
+CSV_FIELDS = ('tla', 'name', 'password', 'channels', 'voice')
+
+NEW_TEAM_COMMAND = re.compile(r'/team new tla:(?P<tla>\S+) name:(?P<name>.*?) password:(?P<password>.*)')
+CHANNEL_COMMAND = re.compile(r'/team channel tla:(?P<tla>\S+) suffix:(?P<suffix>\S+)')
+VOICE_COMMAND = re.compile(r'/team voice tla:(?P<tla>\S+)')
+
+
+class ManifestFormat(Enum):
+    """Formats of manifest, by file extension."""
+
+    commands = 'txt'
+    csv = 'csv'
+    json = 'json'
+
+
+class ManifestError(ValueError):
+    """A manifest of teams which couldn't be read."""
+
+
+class TeamSpec(NamedTuple):
+    """A team's role, channels and password, as listed in a manifest."""
+
+    tla: str
+    name: str
+    password: str
+    # suffixes of the team's secondary channels
+    channels: Tuple[str, ...] = ()
+    voice: bool = False
+
+
+def parse_manifest(filename: str, text: str) -> List[TeamSpec]:
+    """Read a manifest of teams, in the format given by its file extension."""
+    if filename.lower().endswith('.json'):
+        teams = parse_json(text)
+    elif filename.lower().endswith('.csv'):
+        teams = parse_csv(text)
+    else:
+        teams = parse_commands(text)
+
+    tlas = [team.tla for team in teams]
+    if duplicates := sorted({tla for tla in tlas if tlas.count(tla) > 1}):
+        raise ManifestError(f"{', '.join(duplicates)} are listed more than once")
+    return teams
+
+
+def write_manifest(teams: Iterable[TeamSpec], file: IO[str], manifest_format: ManifestFormat) -> None:
+    if manifest_format == ManifestFormat.json:
+        write_json(teams, file)
+    elif manifest_format == ManifestFormat.csv:
+        write_csv(teams, file)
+    else:
+        write_commands(teams, file)
+
+
+def write_commands(teams: Iterable[TeamSpec], file: IO[str]) -> None:
+    """Write the commands to create each team."""
+    for team in teams:
+        file.write(f"/team new tla:{team.tla} name:{team.name} password:{team.password}\n")
+        for suffix in team.channels:
+            file.write(f"/team channel tla:{team.tla} suffix:{suffix}\n")
+        if team.voice:
+            file.write(f"/team voice tla:{team.tla}\n")
+
+
+def write_csv(teams: Iterable[TeamSpec], file: IO[str]) -> None:
+    writer = csv.writer(file)
+    writer.writerow(CSV_FIELDS)
+    for team in teams:
+        writer.writerow([team.tla, team.name, team.password, ' '.join(team.channels), 'yes' if team.voice else ''])
+
+
+def write_json(teams: Iterable[TeamSpec], file: IO[str]) -> None:
+    json.dump(
+        [
+            {
+                'tla': team.tla,
+                'name': team.name,
+                'password': team.password,
+                'channels': list(team.channels),
+                'voice': team.voice,
+            }
+            for team in teams
+        ],
+        file,
+        indent=2,
+    )
+    file.write('\n')
+
+
+def parse_commands(text: str) -> List[TeamSpec]:
+    """Read the commands output by /team export."""
+    teams: Dict[str, TeamSpec] = {}
+    for line_num, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith('```'):
+            continue
+
+        if match := NEW_TEAM_COMMAND.fullmatch(line):
+            tla = match['tla'].upper()
+            teams[tla] = TeamSpec(tla, match['name'], match['password'])
+        elif match := CHANNEL_COMMAND.fullmatch(line):
+            team = _listed_team(teams, match['tla'], line_num)
+            teams[team.tla] = team._replace(channels=team.channels + (match['suffix'].lower(),))
+        elif match := VOICE_COMMAND.fullmatch(line):
+            team = _listed_team(teams, match['tla'], line_num)
+            teams[team.tla] = team._replace(voice=True)
+        else:
+            raise ManifestError(f"Line {line_num} is not a /team new, channel or voice command")
+    return list(teams.values())
+
+
+def parse_csv(text: str) -> List[TeamSpec]:
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames is None or not {'tla', 'name', 'password'} <= set(reader.fieldnames):
+        raise ManifestError("The CSV file needs tla, name and password columns")
+
+    teams = []
+    for row in reader:
+        if not row['tla']:
+            raise ManifestError(f"Line {reader.line_num} needs a TLA")
+        teams.append(TeamSpec(
+            row['tla'].strip().upper(),
+            row['name'] or '',
+            row['password'] or '',
+            tuple(suffix.lower() for suffix in (row.get('channels') or '').split()),
+            (row.get('voice') or '').strip().lower() in ('1', 'true', 'yes', 'y'),
+        ))
+    return teams
+
+
+def parse_json(text: str) -> List[TeamSpec]:
+    """Read a list of teams, each an object with the same fields as the CSV columns."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ManifestError(f"Invalid JSON: {e}") from e
+    if not isinstance(data, list):
+        raise ManifestError("The JSON file should contain a list of teams")
+
+    teams = []
+    for index, team in enumerate(data):
+        try:
+            teams.append(TeamSpec(
+                str(team['tla']).upper(),
+                str(team.get('name', '')),
+                str(team['password']),
+                tuple(str(suffix).lower() for suffix in team.get('channels', [])),
+                bool(team.get('voice', False)),
+            ))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ManifestError(f"Team {index + 1} needs a TLA and password") from e
+    return teams
+
+
+def _listed_team(teams: Dict[str, TeamSpec], tla: str, line_num: int) -> TeamSpec:
+    team = teams.get(tla.upper())
+    if team is None:
+        raise ManifestError(f"Line {line_num} is for team {tla.upper()}, which has no /team new command before it")
+    return team
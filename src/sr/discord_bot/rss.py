@@ -1,34 +1,222 @@
-import os
-from typing import List
+import asyncio
+import logging
+from typing import Dict, List, Tuple, NamedTuple
+from collections import OrderedDict
 
+import aiohttp
 import discord
 import feedparser
 from bs4 import BeautifulSoup
 from feedparser import FeedParserDict
 
-from sr.discord_bot.constants import FEED_URL
-
-
-def get_seen_posts() -> List[str]:
-    if os.path.exists('seen_posts.txt'):
-        with open('seen_posts.txt', 'r') as f:
-            return f.readlines()
-
-    return []
-
-
-def add_seen_post(post_id: str) -> None:
-    with open('seen_posts.txt', 'a') as f:
-        f.write(post_id + '\n')
-
-
-async def check_posts(channel: discord.TextChannel) -> None:
-    feed = feedparser.parse(FEED_URL)
-    post = feed.entries[0]
-
-    if post.id + "\n" not in get_seen_posts():
-        await channel.send(embed=create_embed(post))
-        add_seen_post(post.id)
+from sr.discord_bot.state import StateStore
+from sr.discord_bot.constants import (
+    SEEN_POSTS_LIMIT,
+    FEED_ERROR_BACKOFF,
+    FEED_INITIAL_POSTS,
+    FEED_QUIET_BACKOFF,
+    FEED_CHECK_INTERVAL,
+    FEED_MAX_CHECK_INTERVAL,
+)
+
+
+class FeedValidators(NamedTuple):
+    """HTTP cache validators from the last time the feed was fetched."""
+
+    etag: str | None = None
+    modified: str | None = None
+
+    def request_headers(self) -> Dict[str, str]:
+        """Headers to make a conditional request for the feed."""
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.modified is not None:
+            headers['If-Modified-Since'] = self.modified
+        return headers
+
+
+class SeenPosts:
+    """The IDs of the most recent posts which have already been sent."""
+
+    def __init__(self, state: StateStore, limit: int = SEEN_POSTS_LIMIT) -> None:
+        self.state = state
+        self.limit = limit
+        self._post_ids: OrderedDict[str, None] = OrderedDict.fromkeys(state.seen_posts(limit))
+
+    def __contains__(self, post_id: object) -> bool:
+        return post_id in self._post_ids
+
+    def __len__(self) -> int:
+        return len(self._post_ids)
+
+    def add(self, post_id: str) -> None:
+        """Record a post as sent."""
+        if post_id in self._post_ids:
+            return
+
+        self._post_ids[post_id] = None
+        while len(self._post_ids) > self.limit:
+            self._post_ids.popitem(last=False)
+        self.state.add_seen_post(post_id, self.limit)
+
+
+async def fetch_feed(
+    session: aiohttp.ClientSession,
+    url: str,
+    validators: FeedValidators,
+) -> Tuple[FeedParserDict | None, FeedValidators]:
+    """
+    Fetch and parse a feed, unless it is unchanged since it was last fetched.
+
+    Returns the parsed feed, or None if the server reported it was unchanged,
+    along with the validators to use for the next request.
+    """
+    async with session.get(url, headers=validators.request_headers()) as resp:
+        if resp.status == 304:
+            return None, validators
+        resp.raise_for_status()
+        content = await resp.read()
+        new_validators = FeedValidators(
+            etag=resp.headers.get('ETag'),
+            modified=resp.headers.get('Last-Modified'),
+        )
+        response_headers = {
+            'content-location': str(resp.url),
+            'content-type': resp.headers.get('Content-Type', ''),
+        }
+
+    feed = await asyncio.to_thread(feedparser.parse, content, response_headers=response_headers)
+    return feed, new_validators
+
+
+def unseen_posts(feed: FeedParserDict, seen_posts: SeenPosts) -> List[FeedParserDict]:
+    """Posts in the feed which haven't been sent yet, oldest first."""
+    # Feeds list the newest post first, which is kept for posts without dates
+    posts = [post for post in reversed(feed.entries) if post.id not in seen_posts]
+    posts.sort(key=lambda post: post.get('published_parsed') or post.get('updated_parsed') or ())
+    return posts
+
+
+class Feed(NamedTuple):
+    """A feed whose new posts are sent to a channel."""
+
+    name: str
+    url: str
+    channel: discord.TextChannel
+
+
+class FeedPoller:
+    """
+    Checks a single feed for new posts.
+
+    The interval between checks grows while the feed is quiet or failing, and
+    returns to the minimum once a new post is found.
+    """
+
+    def __init__(
+        self,
+        feed: Feed,
+        seen_posts: SeenPosts,
+        validators: Dict[str, FeedValidators],
+        state: StateStore,
+    ) -> None:
+        self.feed = feed
+        self.seen_posts = seen_posts
+        self.validators = validators
+        self.state = state
+        self.interval: float = FEED_CHECK_INTERVAL
+
+    async def check_posts(self, session: aiohttp.ClientSession) -> int:
+        """Send any new posts in the feed and return how many were sent."""
+        feed, validators = await fetch_feed(
+            session,
+            self.feed.url,
+            self.validators.get(self.feed.url, FeedValidators()),
+        )
+
+        if feed is None:  # feed hasn't changed
+            return 0
+
+        posts = unseen_posts(feed, self.seen_posts)
+
+        if not any(post.id in self.seen_posts for post in feed.entries):
+            # None of the feed's posts have been sent before, so don't send its whole history
+            cut = max(len(posts) - FEED_INITIAL_POSTS, 0)
+            for post in posts[:cut]:
+                self.seen_posts.add(post.id)
+            posts = posts[cut:]
+
+        embeds = await asyncio.to_thread(create_embeds, posts)
+        for post, embed in zip(posts, embeds):
+            # discord.py holds back sends which would exceed the channel's rate limit
+            await self.feed.channel.send(embed=embed)
+            self.seen_posts.add(post.id)
+
+        # only skip the feed once its posts have been handled
+        self.validators[self.feed.url] = validators
+        self.state.set_feed_validators(self.feed.url, validators.etag, validators.modified)
+        return len(posts)
+
+    def update_interval(self, new_posts: int, failed: bool = False) -> None:
+        if new_posts:
+            self.interval = FEED_CHECK_INTERVAL
+        else:
+            backoff = FEED_ERROR_BACKOFF if failed else FEED_QUIET_BACKOFF
+            self.interval = min(self.interval * backoff, FEED_MAX_CHECK_INTERVAL)
+
+
+class FeedReader:
+    """Polls all of the followed feeds concurrently, sharing one HTTP session."""
+
+    def __init__(self, logger: logging.Logger, state: StateStore) -> None:
+        self.logger = logger
+        self.state = state
+        self.seen_posts = SeenPosts(state)
+        self.validators = {
+            url: FeedValidators(etag, modified)
+            for url, (etag, modified) in state.feed_validators().items()
+        }
+        self._session: aiohttp.ClientSession | None = None
+        self._tasks: List[asyncio.Task[None]] = []
+
+    @property
+    def running(self) -> bool:
+        return self._session is not None
+
+    def start(self, feeds: List[Feed]) -> None:
+        """Start polling the given feeds."""
+        self._session = aiohttp.ClientSession()
+        for feed in feeds:
+            poller = FeedPoller(feed, self.seen_posts, self.validators, self.state)
+            self._tasks.append(asyncio.create_task(self._poll(poller, self._session)))
+
+    async def close(self) -> None:
+        """Stop polling and close the HTTP session."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _poll(self, poller: FeedPoller, session: aiohttp.ClientSession) -> None:
+        name = poller.feed.name
+        while True:
+            self.logger.info(f"Checking for new posts in the {name} feed")
+            try:
+                new_posts = await poller.check_posts(session)
+            except Exception:
+                self.logger.exception(f"Failed to check the {name} feed")
+                poller.update_interval(0, failed=True)
+            else:
+                poller.update_interval(new_posts)
+            await asyncio.sleep(poller.interval)
+
+
+def create_embeds(posts: List[FeedParserDict]) -> List[discord.Embed]:
+    return [create_embed(post) for post in posts]
 
 
 def create_embed(post: FeedParserDict) -> discord.Embed:
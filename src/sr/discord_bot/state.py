@@ -0,0 +1,301 @@
+import os
+import json
+import asyncio
+import logging
+import sqlite3
+from typing import Set, Dict, List, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+
+from sr.discord_bot.constants import STATE_FLUSH_DELAY, STATE_RETRY_DELAY
+
+# database to store the bot's state between reboots
+STATE_DB_FILE = 'state.db'
+
+# files which stored the bot's state before the database, imported on first start
+PASSWORDS_FILE = 'passwords.json'
+SUBSCRIBE_MSG_FILE = 'subscribed_messages.json'
+SEEN_POSTS_FILE = 'seen_posts.txt'
+FEED_STATE_FILE = 'feed_state.json'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS passwords (
+    tla TEXT PRIMARY KEY,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subscribed_messages (
+    message_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    members INTEGER NOT NULL,
+    warnings INTEGER NOT NULL,
+    stats INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen_posts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    post_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS feed_validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    modified TEXT
+);
+CREATE TABLE IF NOT EXISTS logs_jobs (
+    url TEXT NOT NULL,
+    event_name TEXT NOT NULL,
+    finished INTEGER NOT NULL,
+    PRIMARY KEY (url, event_name)
+);
+CREATE TABLE IF NOT EXISTS logs_job_teams (
+    url TEXT NOT NULL,
+    event_name TEXT NOT NULL,
+    tla TEXT NOT NULL,
+    PRIMARY KEY (url, event_name, tla)
+);
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY
+);
+"""
+
+SQLValue = Union[str, int, None]
+Statement = Tuple[str, Tuple[SQLValue, ...]]
+
+
+class StateStore:
+    """
+    The bot's persistent state, held in an SQLite database.
+
+    State is read synchronously while the bot starts, later reads wait for any
+    queued writes. Writes are queued and committed together in a single
+    transaction on a worker thread, shortly after the first write of a batch.
+    A batch which fails to commit is kept and tried again later.
+    """
+
+    def __init__(self, logger: logging.Logger, path: str = STATE_DB_FILE) -> None:
+        self.logger = logger
+        # Only used from one thread at a time, reads happen before any writes are queued
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._pending: List[Statement] = []
+        self._flush_task: asyncio.Task[None] | None = None
+        # Held from taking a batch until it's committed or queued again, so batches are saved in order
+        self._flush_lock = asyncio.Lock()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='state')
+        self._migrate_files()
+
+    def passwords(self) -> Dict[str, str]:
+        """A mapping from TLA to the password for that team."""
+        return dict(self._db.execute('SELECT tla, password FROM passwords'))
+
+    def set_password(self, tla: str, password: str) -> None:
+        self._queue('INSERT OR REPLACE INTO passwords (tla, password) VALUES (?, ?)', (tla, password))
+
+    def set_passwords(self, passwords: Dict[str, str]) -> None:
+        for tla, password in passwords.items():
+            self.set_password(tla, password)
+
+    def remove_password(self, tla: str) -> None:
+        self._queue('DELETE FROM passwords WHERE tla = ?', (tla,))
+
+    def subscribed_messages(self) -> List[Dict[str, int | bool]]:
+        """The details of each subscribed message, in the order they were subscribed."""
+        return [
+            {
+                'channel_id': channel_id,
+                'message_id': message_id,
+                'members': bool(members),
+                'warnings': bool(warnings),
+                'stats': bool(stats),
+            }
+            for channel_id, message_id, members, warnings, stats in self._db.execute(
+                'SELECT channel_id, message_id, members, warnings, stats FROM subscribed_messages ORDER BY rowid',
+            )
+        ]
+
+    def add_subscribed_message(self, channel_id: int, message_id: int, members: bool, warnings: bool,
+                               stats: bool) -> None:
+        self._queue(
+            'INSERT OR REPLACE INTO subscribed_messages (channel_id, message_id, members, warnings, stats) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (channel_id, message_id, members, warnings, stats),
+        )
+
+    def remove_subscribed_message(self, message_id: int) -> None:
+        self._queue('DELETE FROM subscribed_messages WHERE message_id = ?', (message_id,))
+
+    def seen_posts(self, limit: int) -> List[str]:
+        """The IDs of the most recently sent posts, oldest first."""
+        rows = self._db.execute('SELECT post_id FROM seen_posts ORDER BY id DESC LIMIT ?', (limit,))
+        return [post_id for post_id, in rows][::-1]
+
+    def add_seen_post(self, post_id: str, limit: int) -> None:
+        """Record a post as sent, keeping only the most recent posts."""
+        self._queue('INSERT OR IGNORE INTO seen_posts (post_id) VALUES (?)', (post_id,))
+        self._queue(
+            'DELETE FROM seen_posts WHERE id NOT IN (SELECT id FROM seen_posts ORDER BY id DESC LIMIT ?)',
+            (limit,),
+        )
+
+    def feed_validators(self) -> Dict[str, Tuple[str | None, str | None]]:
+        """The ETag and Last-Modified validators for each feed, by URL."""
+        return {
+            url: (etag, modified)
+            for url, etag, modified in self._db.execute('SELECT url, etag, modified FROM feed_validators')
+        }
+
+    def set_feed_validators(self, url: str, etag: str | None, modified: str | None) -> None:
+        self._queue(
+            'INSERT OR REPLACE INTO feed_validators (url, etag, modified) VALUES (?, ?, ?)',
+            (url, etag, modified),
+        )
+
+    def unfinished_logs_jobs(self) -> List[Tuple[str, str]]:
+        """The URL and event name of each distribution of logs which was interrupted."""
+        return list(self._db.execute('SELECT url, event_name FROM logs_jobs WHERE finished = 0 ORDER BY rowid'))
+
+    async def logs_job_teams(self, url: str, event_name: str) -> Set[str]:
+        """The TLAs of the teams which have been sent the logs from a URL for an event."""
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._logs_job_teams, url, event_name)
+
+    def start_logs_job(self, url: str, event_name: str, restart: bool = False) -> None:
+        """Record the start of a distribution of logs, forgetting the teams already sent them if restarting."""
+        self._queue(
+            'INSERT OR REPLACE INTO logs_jobs (url, event_name, finished) VALUES (?, ?, 0)',
+            (url, event_name),
+        )
+        if restart:
+            self._queue('DELETE FROM logs_job_teams WHERE url = ? AND event_name = ?', (url, event_name))
+
+    def add_logs_job_team(self, url: str, event_name: str, tla: str) -> None:
+        self._queue(
+            'INSERT OR IGNORE INTO logs_job_teams (url, event_name, tla) VALUES (?, ?, ?)',
+            (url, event_name, tla),
+        )
+
+    def finish_logs_job(self, url: str, event_name: str) -> None:
+        self._queue('UPDATE logs_jobs SET finished = 1 WHERE url = ? AND event_name = ?', (url, event_name))
+
+    async def flush(self) -> None:
+        """Commit all queued writes."""
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if batch and not await asyncio.get_running_loop().run_in_executor(self._executor, self._commit, batch):
+                # The changes are already in use, keep them ahead of any newer writes to try again
+                self._pending[:0] = batch
+                if not self._closed and self._flush_task is None:
+                    self._flush_task = asyncio.create_task(self._delayed_flush(STATE_RETRY_DELAY))
+
+    async def close(self) -> None:
+        """Commit any queued writes and close the database."""
+        self._closed = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        self._executor.shutdown()
+        self._db.close()
+
+    def _queue(self, sql: str, params: Tuple[SQLValue, ...]) -> None:
+        self._pending.append((sql, params))
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not started yet, nothing to write behind
+            batch, self._pending = self._pending, []
+            if not self._commit(batch):
+                self._pending[:0] = batch  # sent with the next batch
+            return
+
+        if self._flush_task is None:
+            self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self, delay: float = STATE_FLUSH_DELAY) -> None:
+        await asyncio.sleep(delay)
+        # Writes from this point on need a new flush
+        self._flush_task = None
+        await self.flush()
+
+    def _logs_job_teams(self, url: str, event_name: str) -> Set[str]:
+        rows = self._db.execute(
+            'SELECT tla FROM logs_job_teams WHERE url = ? AND event_name = ?',
+            (url, event_name),
+        )
+        return {tla for tla, in rows}
+
+    def _commit(self, batch: List[Statement]) -> bool:
+        try:
+            with self._db:  # commits the batch as one transaction, or rolls it back
+                for sql, params in batch:
+                    self._db.execute(sql, params)
+        except sqlite3.Error:
+            self.logger.exception(f"Failed to save {len(batch)} changes to the bot's state")
+            return False
+        return True
+
+    def _migrate_files(self) -> None:
+        """Import the state files used before the database, the first time it's opened."""
+        if self._db.execute("SELECT 1 FROM migrations WHERE name = 'files'").fetchone():
+            return
+
+        batch: List[Statement] = []
+
+        try:
+            with open(PASSWORDS_FILE) as f:
+                batch.extend(
+                    ('INSERT OR REPLACE INTO passwords (tla, password) VALUES (?, ?)', (tla, password))
+                    for tla, password in json.load(f).items()
+                )
+        except (json.JSONDecodeError, FileNotFoundError):
+            pass
+
+        try:
+            with open(SUBSCRIBE_MSG_FILE) as f:
+                batch.extend(
+                    (
+                        'INSERT OR REPLACE INTO subscribed_messages '
+                        '(channel_id, message_id, members, warnings, stats) VALUES (?, ?, ?, ?, ?)',
+                        (
+                            msg['channel_id'],
+                            msg['message_id'],
+                            msg.get('members', True),
+                            msg.get('warnings', True),
+                            msg.get('stats', False),
+                        ),
+                    )
+                    for msg in json.load(f)
+                )
+        except (json.JSONDecodeError, FileNotFoundError):
+            pass
+
+        try:
+            with open(SEEN_POSTS_FILE) as f:
+                batch.extend(
+                    ('INSERT OR IGNORE INTO seen_posts (post_id) VALUES (?)', (line.strip(),))
+                    for line in f
+                    if line.strip()
+                )
+        except FileNotFoundError:
+            pass
+
+        try:
+            with open(FEED_STATE_FILE) as f:
+                batch.extend(
+                    (
+                        'INSERT OR REPLACE INTO feed_validators (url, etag, modified) VALUES (?, ?, ?)',
+                        (url, validators.get('etag'), validators.get('modified')),
+                    )
+                    for url, validators in json.load(f).items()
+                )
+        except (json.JSONDecodeError, FileNotFoundError, AttributeError):
+            pass
+
+        batch.append(("INSERT INTO migrations (name) VALUES ('files')", ()))
+        if not self._commit(batch):
+            return
+
+        for path in (PASSWORDS_FILE, SUBSCRIBE_MSG_FILE, SEEN_POSTS_FILE, FEED_STATE_FILE):
+            if os.path.exists(path):
+                os.replace(path, f'{path}.migrated')
+                self.logger.info(f"Imported {path} into the state database")
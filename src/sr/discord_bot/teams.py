@@ -1,5 +1,4 @@
-from typing import List, NamedTuple
-from statistics import mean
+from typing import Dict, List, Tuple, FrozenSet, NamedTuple
 from collections import defaultdict
 
 import discord
@@ -33,78 +32,176 @@ class TeamData(NamedTuple):
         return data_str
 
 
-class TeamsData(NamedTuple):
+class TeamsData:
     """A container for a list of TeamData objects."""
 
     teams_data: List[TeamData]
+    # Incremented whenever teams_data changes
+    generation: int
+
+    def __init__(self, teams_data: List[TeamData]) -> None:
+        self.teams_data = teams_data
+        self.generation = 0
+        # Per-TLA counts, kept in step with teams_data so that role changes
+        # can be applied without rescanning every team role.
+        self._member_counts: Dict[str, int] = {}
+        self._leader_counts: Dict[str, int] = {}
+        self._positions: Dict[str, int] = {}
+        self._summary: TeamsSummary | None = None
 
     def gen_team_memberships(self, guild: discord.Guild, leader_role: discord.Role) -> None:
         """Generate a list of TeamData objects for the given guild, stored in teams_data."""
-        teams_data = []
+        member_counts: Dict[str, int] = {}
+        leader_counts: Dict[str, int] = {}
+
+        for role in guild.roles:
+            if not role.name.startswith(ROLE_PREFIX):
+                continue
+            tla = role.name[len(ROLE_PREFIX):]
+            members = role.members
+            leaders = sum(1 for member in members if _is_leader(member, leader_role))
+            member_counts[tla] = len(members) - leaders
+            leader_counts[tla] = leaders
+
+        self._member_counts = member_counts
+        self._leader_counts = leader_counts
+
+        teams_data = [
+            TeamData(TLA=tla, members=member_counts[tla], leader=leader_counts[tla] > 0)
+            for tla in sorted(member_counts)  # sort by TLA
+        ]
+        self._positions = {team.TLA: index for index, team in enumerate(teams_data)}
+        if teams_data != self.teams_data:
+            self.teams_data.clear()
+            self.teams_data.extend(teams_data)
+            self._memberships_changed()
+
+    def update_member(self, before: discord.Member, after: discord.Member, leader_role: discord.Role) -> bool:
+        """
+        Apply a member's role changes to the team memberships.
+
+        Returns whether any team's data changed. If the stored counts are
+        found to be out of step with the guild they are regenerated in full.
+        """
+        was_leader = _is_leader(before, leader_role)
+        is_leader = _is_leader(after, leader_role)
+        before_tlas = _team_tlas(before)
+        after_tlas = _team_tlas(after)
+
+        if was_leader == is_leader:
+            # Teams the member stayed in are unaffected
+            return self._apply_changes(
+                after.guild,
+                leader_role,
+                removed=before_tlas - after_tlas,
+                added=after_tlas - before_tlas,
+                was_leader=was_leader,
+                is_leader=is_leader,
+            )
+        return self._apply_changes(
+            after.guild,
+            leader_role,
+            removed=before_tlas,
+            added=after_tlas,
+            was_leader=was_leader,
+            is_leader=is_leader,
+        )
+
+    def remove_member(self, member: discord.Member, leader_role: discord.Role) -> bool:
+        """Remove a member who has left the guild from the team memberships."""
+        is_leader = _is_leader(member, leader_role)
+        return self._apply_changes(
+            member.guild,
+            leader_role,
+            removed=_team_tlas(member),
+            added=frozenset(),
+            was_leader=is_leader,
+            is_leader=is_leader,
+        )
 
-        for role in filter(lambda role: role.name.startswith(ROLE_PREFIX), guild.roles):
+    def _apply_changes(
+        self,
+        guild: discord.Guild,
+        leader_role: discord.Role,
+        *,
+        removed: FrozenSet[str],
+        added: FrozenSet[str],
+        was_leader: bool,
+        is_leader: bool,
+    ) -> bool:
+        if not removed and not added:
+            return False
+
+        if any(tla not in self._positions for tla in removed | added):
+            # A team role we haven't seen, the index has drifted
+            return self._regenerate(guild, leader_role)
+
+        for tla in removed:
+            counts = self._leader_counts if was_leader else self._member_counts
+            counts[tla] -= 1
+            if counts[tla] < 0:
+                return self._regenerate(guild, leader_role)
+
+        for tla in added:
+            counts = self._leader_counts if is_leader else self._member_counts
+            counts[tla] += 1
+
+        changed = False
+        for tla in removed | added:
+            position = self._positions[tla]
             team_data = TeamData(
-                TLA=role.name[len(ROLE_PREFIX):],
-                members=len(list(filter(
-                    lambda member: leader_role not in member.roles,
-                    role.members,
-                ))),
-                leader=len(list(filter(
-                    lambda member: leader_role in member.roles,
-                    role.members,
-                ))) > 0,
+                TLA=tla,
+                members=self._member_counts[tla],
+                leader=self._leader_counts[tla] > 0,
             )
+            if team_data != self.teams_data[position]:
+                self.teams_data[position] = team_data
+                changed = True
+
+        if changed:
+            self._memberships_changed()
+        return changed
 
-            teams_data.append(team_data)
+    def _regenerate(self, guild: discord.Guild, leader_role: discord.Role) -> bool:
+        generation = self.generation
+        self.gen_team_memberships(guild, leader_role)
+        return self.generation != generation
 
-        teams_data.sort(key=lambda team: team.TLA)  # sort by TLA
-        self.teams_data.clear()
-        self.teams_data.extend(teams_data)
+    def _memberships_changed(self) -> None:
+        self.generation += 1
+        self._summary = None
+
+    @property
+    def summary(self) -> 'TeamsSummary':
+        """Aggregate figures for the teams, recalculated when memberships change."""
+        if self._summary is None:
+            self._summary = TeamsSummary.from_teams(self.teams_data)
+        return self._summary
 
     @property
     def empty_tlas(self) -> List[str]:
         """A list of TLAs for teams with no members or supervisors."""
-        return [
-            team.TLA
-            for team in self.teams_data
-            if not team.leader and team.members == 0
-        ]
+        return self.summary.empty_tlas
 
     @property
     def missing_leaders(self) -> List[str]:
         """A list of TLAs for teams with no supervisors but at least one member."""
-        return [
-            team.TLA
-            for team in self.teams_data
-            if not team.leader and team.members > 0
-        ]
+        return self.summary.missing_leaders
 
     @property
     def leader_only(self) -> List[str]:
         """A list of TLAs for teams with only supervisors and no members."""
-        return [
-            team.TLA
-            for team in self.teams_data
-            if team.leader and team.members == 0
-        ]
+        return self.summary.leader_only
 
     @property
     def empty_primary_teams(self) -> List[str]:
         """A list of TLAs for primary teams with no members."""
-        return [
-            team.TLA
-            for team in self.teams_data
-            if team.is_primary() and team.TLA in self.empty_tlas
-        ]
+        return self.summary.empty_primary_teams
 
     @property
     def primary_leader_only(self) -> List[str]:
         """A list of TLAs for primary teams with only supervisors."""
-        return [
-            team.TLA
-            for team in self.teams_data
-            if team.is_primary() and team.TLA in self.leader_only
-        ]
+        return self.summary.primary_leader_only
 
     def team_summary(self) -> str:
         """A summary of the teams."""
@@ -118,38 +215,111 @@ class TeamsData(NamedTuple):
 
     def warnings(self) -> str:
         """A list of warnings for the teams."""
+        summary = self.summary
         return '\n'.join([
-            f'Empty teams: {len(self.empty_tlas)}',
-            f'Teams without supervisors: {len(self.missing_leaders)}',
-            f'Teams with only supervisors: {len(self.leader_only)}',
+            f'Empty teams: {len(summary.empty_tlas)}',
+            f'Teams without supervisors: {len(summary.missing_leaders)}',
+            f'Teams with only supervisors: {len(summary.leader_only)}',
             '',
-            f'Empty primary teams: {len(self.empty_primary_teams)}',
-            f'Primary teams with only supervisors: {len(self.primary_leader_only)}',
+            f'Empty primary teams: {len(summary.empty_primary_teams)}',
+            f'Primary teams with only supervisors: {len(summary.primary_leader_only)}',
         ])
 
     def statistics(self) -> str:
         """A list of statistics for the teams."""
-        num_teams: int = len(self.teams_data)
-        member_counts = [team.members for team in self.teams_data]
-        num_members = sum(member_counts)
-        num_schools = len([team for team in self.teams_data if team.is_primary()])
+        summary = self.summary
+        num_teams = len(self.teams_data)
+        if summary.min_team is None or summary.max_team is None:
+            return f'Total teams: {num_teams}'
 
-        min_team = min(self.teams_data, key=lambda x: x.members)
-        max_team = max(self.teams_data, key=lambda x: x.members)
-
-        school_members = defaultdict(list)
-        for team in self.teams_data:
-            school_members[team.school()].append(team.members)
-        school_avg = {school: mean(members) for school, members in school_members.items()}
-        max_avg_school, max_avg_size = max(school_avg.items(), key=lambda x: x[1])
+        max_avg_school, max_avg_size = summary.max_school_average
 
         return '\n'.join([
             f'Total teams: {num_teams}',
-            f'Total schools: {num_schools}',
-            f'Total students: {num_members}',
-            f'Max team size: {max_team.members} ({max_team.TLA})',
-            f'Min team size: {min_team.members} ({min_team.TLA})',
-            f'Average team size: {mean(member_counts):.1f}',
-            f'Average school members: {num_members / num_schools:.1f}',
+            f'Total schools: {summary.num_schools}',
+            f'Total students: {summary.num_members}',
+            f'Max team size: {summary.max_team.members} ({summary.max_team.TLA})',
+            f'Min team size: {summary.min_team.members} ({summary.min_team.TLA})',
+            f'Average team size: {summary.num_members / num_teams:.1f}',
+            f'Average school members: {summary.num_members / summary.num_schools:.1f}',
             f'Max team size, school average: {max_avg_size:.1f} ({max_avg_school})',
         ])
+
+
+class TeamsSummary(NamedTuple):
+    """Aggregate figures for a list of TeamData objects."""
+
+    empty_tlas: List[str]
+    missing_leaders: List[str]
+    leader_only: List[str]
+    empty_primary_teams: List[str]
+    primary_leader_only: List[str]
+    num_members: int
+    num_schools: int
+    min_team: TeamData | None
+    max_team: TeamData | None
+    max_school_average: Tuple[str, float]
+
+    @classmethod
+    def from_teams(cls, teams_data: List[TeamData]) -> 'TeamsSummary':
+        """Calculate the summary in a single pass over the teams."""
+        empty_tlas = []
+        missing_leaders = []
+        leader_only = []
+        empty_primary_teams = []
+        primary_leader_only = []
+        num_members = 0
+        num_schools = 0
+        min_team: TeamData | None = None
+        max_team: TeamData | None = None
+        school_members: Dict[str, List[int]] = defaultdict(list)
+
+        for team in teams_data:
+            primary = team.is_primary()
+            if not team.leader and team.members == 0:
+                empty_tlas.append(team.TLA)
+                if primary:
+                    empty_primary_teams.append(team.TLA)
+            elif not team.leader:
+                missing_leaders.append(team.TLA)
+            elif team.members == 0:
+                leader_only.append(team.TLA)
+                if primary:
+                    primary_leader_only.append(team.TLA)
+
+            num_members += team.members
+            if primary:
+                num_schools += 1
+            if min_team is None or team.members < min_team.members:
+                min_team = team
+            if max_team is None or team.members > max_team.members:
+                max_team = team
+            school_members[team.school()].append(team.members)
+
+        school_avg = {school: sum(members) / len(members) for school, members in school_members.items()}
+
+        return cls(
+            empty_tlas=empty_tlas,
+            missing_leaders=missing_leaders,
+            leader_only=leader_only,
+            empty_primary_teams=empty_primary_teams,
+            primary_leader_only=primary_leader_only,
+            num_members=num_members,
+            num_schools=num_schools,
+            min_team=min_team,
+            max_team=max_team,
+            max_school_average=max(school_avg.items(), key=lambda x: x[1], default=('', 0.0)),
+        )
+
+
+def _is_leader(member: discord.Member, leader_role: discord.Role) -> bool:
+    return member.get_role(leader_role.id) is not None
+
+
+def _team_tlas(member: discord.Member) -> FrozenSet[str]:
+    """The TLAs of the teams the member has a role for."""
+    return frozenset(
+        role.name[len(ROLE_PREFIX):]
+        for role in member.roles
+        if role.name.startswith(ROLE_PREFIX)
+    )